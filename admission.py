@@ -0,0 +1,241 @@
+"""
+Cost-aware admission control for Z-Image-Turbo
+
+Runtime grows with resolution, steps and images per run, so counting
+requests says little about how long the queue will take to drain. A cost
+model fitted from measured pipeline runs estimates each request's runtime;
+admission control keeps the estimated backlog and turns requests away with
+a Retry-After as soon as they could not finish within the latency budget,
+instead of letting them wait until the client times out.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Optional
+
+from config import settings
+from scheduler import DeadlineExceededError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REFERENCE_PIXELS = 512 * 512
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request would not finish within the latency budget"""
+
+    def __init__(self, retry_after: int, estimated_seconds: float):
+        super().__init__(f"Estimated completion in {estimated_seconds:.0f}s exceeds the latency budget")
+        self.retry_after = retry_after
+        self.estimated_seconds = estimated_seconds
+
+
+def work_units(height: int, width: int, steps: int, images: int = 1, guidance_scale: float = 0.0) -> float:
+    """
+    Size of a pipeline run in 512x512 denoising steps
+
+    Classifier-free guidance runs the transformer on a doubled batch.
+    """
+    cfg = 2 if guidance_scale > 1.0 else 1
+    return height * width / REFERENCE_PIXELS * steps * images * cfg
+
+
+class _Fit:
+    """Exponentially weighted least-squares fit of seconds = overhead + rate * units"""
+
+    def __init__(self, decay: float):
+        self.decay = decay
+        self.weight = 0.0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+        self.samples = 0
+
+    def add(self, x: float, y: float):
+        d = self.decay
+        self.weight = self.weight * d + 1
+        self.sum_x = self.sum_x * d + x
+        self.sum_y = self.sum_y * d + y
+        self.sum_xx = self.sum_xx * d + x * x
+        self.sum_xy = self.sum_xy * d + x * y
+        self.samples += 1
+
+    def coefficients(self) -> Optional[tuple[float, float]]:
+        """(overhead seconds, seconds per unit), or None before the first sample"""
+        if not self.samples or self.sum_x <= 0:
+            return None
+        variance = self.sum_xx * self.weight - self.sum_x ** 2
+        if variance > 1e-9 * self.sum_xx * self.weight:
+            rate = (self.sum_xy * self.weight - self.sum_x * self.sum_y) / variance
+            overhead = (self.sum_y - rate * self.sum_x) / self.weight
+            if rate > 0 and overhead >= 0:
+                return overhead, rate
+        # All runs the same size so far (or a noisy fit): scale proportionally
+        return 0.0, self.sum_y / self.sum_x
+
+
+class CostModel:
+    """Estimates pipeline runtime per model variant from measured runs"""
+
+    def __init__(self, prior_step_seconds: Optional[float] = None, decay: float = 0.98):
+        self.prior_step_seconds = prior_step_seconds or settings.COST_PRIOR_STEP_SECONDS
+        self.decay = decay
+        self._fits: dict[str, _Fit] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: Optional[str], units: float, seconds: float):
+        """Record the measured duration of one pipeline run"""
+        if units <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            self._fits.setdefault(model or "", _Fit(self.decay)).add(units, seconds)
+
+    def estimate(self, model: Optional[str], units: float) -> float:
+        """Estimated seconds for a run of the given size"""
+        with self._lock:
+            fit = self._fits.get(model or "")
+            coefficients = fit.coefficients() if fit else None
+        if coefficients is None:
+            return units * self.prior_step_seconds
+        overhead, rate = coefficients
+        return overhead + rate * units
+
+    def get_stats(self) -> dict:
+        """Get fitted coefficients per model variant"""
+        with self._lock:
+            stats = {}
+            for model, fit in self._fits.items():
+                overhead, rate = fit.coefficients() or (0.0, self.prior_step_seconds)
+                stats[model] = {
+                    "samples": fit.samples,
+                    "overhead_seconds": round(overhead, 4),
+                    "seconds_per_512_step": round(rate, 4),
+                }
+            return {"prior_seconds_per_512_step": self.prior_step_seconds, "models": stats}
+
+
+class Ticket:
+    """
+    Estimated work admitted for one request
+
+    Released when the request finishes, either by leaving its with-block or
+    by calling release() for work that outlives the handler (streams).
+    """
+
+    def __init__(self, controller: Optional["AdmissionController"], cost: float, estimated_completion: float):
+        self._controller = controller
+        self.cost = cost
+        self.estimated_completion = estimated_completion  # Seconds from admission until the result is expected
+
+    def release(self):
+        if self._controller is not None:
+            self._controller._release(self.cost)
+            self._controller = None
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionController:
+    """Tracks the estimated backlog and sheds requests that would exceed the latency budget"""
+
+    def __init__(self, cost_model: CostModel, latency_budget: Optional[float] = None):
+        self.cost_model = cost_model
+        self.latency_budget = latency_budget if latency_budget is not None else settings.ADMISSION_LATENCY_BUDGET
+        self._lock = threading.Lock()
+        self._backlog = 0.0
+        self._in_flight = 0
+
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self, model: Optional[str], units: float, parallelism: int = 1, enforce: bool = True,
+              deadline: Optional[float] = None) -> Ticket:
+        """
+        Add a request's estimated cost to the backlog
+
+        A request is always admitted when nothing else is in flight, so one
+        that exceeds the budget on its own is slow rather than unservable.
+
+        Args:
+            model: Model variant the request runs on
+            units: Size of the request, see work_units
+            parallelism: Pipeline runs that execute at once (streams)
+            enforce: False to count the work without ever rejecting it, for
+                work that was already accepted elsewhere (jobs, batch items)
+            deadline: time.monotonic() by which the client needs the result
+
+        Returns:
+            Ticket: Release it when the request has finished
+
+        Raises:
+            AdmissionRejected: If the estimated completion time exceeds the
+                latency budget
+            DeadlineExceededError: If the request would finish after its deadline
+        """
+        cost = self.cost_model.estimate(model, units)
+        with self._lock:
+            # The work ahead drains on every stream at once, this request then runs on one
+            completion = self._backlog / max(1, parallelism) + cost
+            if deadline is not None and time.monotonic() + completion > deadline:
+                self.rejected += 1
+                raise DeadlineExceededError(completion)
+            if (enforce and self.latency_budget > 0 and self._in_flight
+                    and completion > self.latency_budget):
+                self.rejected += 1
+                # Time until enough of the backlog has drained for this request to fit
+                retry_after = max(1, math.ceil(completion - self.latency_budget))
+                raise AdmissionRejected(retry_after, completion)
+            self._backlog += cost
+            self._in_flight += 1
+            self.admitted += 1
+        return Ticket(self, cost, completion)
+
+    def _release(self, cost: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._backlog = max(0.0, self._backlog - cost) if self._in_flight else 0.0
+
+    @property
+    def backlog_seconds(self) -> float:
+        with self._lock:
+            return self._backlog
+
+    def get_stats(self) -> dict:
+        """Get the estimated backlog, admission counters and the cost model"""
+        with self._lock:
+            return {
+                "latency_budget_seconds": self.latency_budget,
+                "backlog_seconds": round(self._backlog, 3),
+                "in_flight": self._in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "cost_model": self.cost_model.get_stats(),
+            }
+
+
+# Global instances
+_cost_model: Optional[CostModel] = None
+_admission: Optional[AdmissionController] = None
+
+
+def get_cost_model() -> CostModel:
+    """Get or create global cost model instance"""
+    global _cost_model
+    if _cost_model is None:
+        _cost_model = CostModel()
+    return _cost_model
+
+
+def get_admission() -> AdmissionController:
+    """Get or create global admission controller instance"""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(get_cost_model())
+    return _admission
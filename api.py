@@ -1,19 +1,47 @@
 """
 FastAPI application for Z-Image-Turbo text-to-image generation
 """
+import asyncio
+import dataclasses
+import json
 import logging
-from typing import Optional
+import random
+import time
+from typing import Literal, Optional
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel, Field
-
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from starlette.background import BackgroundTask
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from admission import AdmissionRejected, Ticket, get_admission
+from api_keys import Client, ClientSlot, InvalidApiKeyError, RateLimitedError, get_client_registry
+from batcher import get_batcher
+from buckets import BucketPolicyError
 from config import settings
-from generator import get_generator
+from degradation import get_degrader
+from embedding_cache import get_embedding_cache
+from executor import QueueFullError, get_executor
+from generator import GenerationJob, get_generator
+from imaging import EncodeOptions, encode_image, latent_preview, media_type_for, resolve_encode_options, to_data_uri
+from jobs import COMPLETED, FAILED, JobQueueFullError, JobRecord, get_job_queue
+from metrics import get_metrics
+from model_manager import UnknownModelError, get_model_registry
+from result_cache import get_result_cache
+from scheduler import DeadlineExceededError
+from storage import get_image_store
+from warmup import get_warmup
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Generations abandoned because the client closed the connection
+_client_disconnects = 0
+
+# Background warm-up task, kept referenced until it finishes
+_warmup_task: Optional[asyncio.Task] = None
+
 app = FastAPI(
     title="Z-Image-Turbo API",
     description="Text-to-image generation API using Z-Image-Turbo with OpenVINO",
@@ -29,6 +57,55 @@ class GenerationRequest(BaseModel):
     num_inference_steps: Optional[int] = Field(None, description="Number of inference steps", ge=1, le=50)
     guidance_scale: Optional[float] = Field(None, description="Guidance scale (0.0 for Turbo models)", ge=0.0, le=10.0)
     seed: Optional[int] = Field(None, description="Random seed for reproducibility")
+    format: Optional[Literal["png", "jpeg", "webp"]] = Field(None, description="Output image format (default from settings)")
+    quality: Optional[int] = Field(None, description="JPEG/WebP quality", ge=1, le=100)
+    compress_level: Optional[int] = Field(None, description="PNG compression level (0 fastest, 9 smallest)", ge=0, le=9)
+    lossless: Optional[bool] = Field(None, description="Lossless WebP encoding")
+    model: Optional[str] = Field(None, description="Model variant, e.g. int4 or fp16 (default from settings)")
+    num_images: Optional[int] = Field(
+        None, description="Number of images from one prompt, seeded seed, seed+1, ...",
+        ge=1, le=settings.MAX_IMAGES_PER_REQUEST
+    )
+    seeds: Optional[list[int]] = Field(
+        None, description="One seed per image, instead of seed and num_images",
+        min_length=1, max_length=settings.MAX_IMAGES_PER_REQUEST
+    )
+    allow_degraded: bool = Field(
+        False, description="Accept fewer steps or a smaller render size, upscaled, when the server is overloaded"
+    )
+
+    @model_validator(mode="after")
+    def _one_way_to_seed(self) -> "GenerationRequest":
+        if self.seed is not None and self.seeds is not None:
+            raise ValueError("Give either seed or seeds, not both")
+        return self
+
+    @property
+    def multiple(self) -> bool:
+        """Whether the request asks for more than one image"""
+        return self.seeds is not None or (self.num_images or 1) > 1
+
+
+class BatchGenerationRequest(BaseModel):
+    """Request model for generating many images in one call"""
+    # Validated one by one in the handler, so an invalid item fails on its own line, not the whole batch
+    items: list[dict] = Field(
+        ..., description="Generation requests", min_length=1, max_length=settings.BATCH_REQUEST_MAX_ITEMS
+    )
+
+
+class StreamRequest(GenerationRequest):
+    """Request model for streamed generation with progress events"""
+    previews: bool = Field(False, description="Include low-resolution previews decoded from intermediate latents")
+    preview_interval: int = Field(1, description="Send a preview every N steps", ge=1, le=50)
+    return_image: bool = Field(False, description="Embed the final image as a data URI in the complete event")
+
+
+class ImageResult(BaseModel):
+    """One image of a multi-image generation"""
+    seed: Optional[int] = None
+    filename: str
+    image_url: str
 
 
 class GenerationResponse(BaseModel):
@@ -38,23 +115,172 @@ class GenerationResponse(BaseModel):
     image_url: Optional[str] = None
     filename: Optional[str] = None
     preview_url: Optional[str] = None
+    images: Optional[list[ImageResult]] = None  # Every image when num_images or seeds was given
+
+
+class JobStatusResponse(BaseModel):
+    """Response model for an asynchronous job"""
+    id: str
+    status: str
+    queue_position: Optional[int] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status_url: str
+    result_url: Optional[str] = None
+    error: Optional[str] = None
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on startup"""
+    global _warmup_task
     logger.info("Starting Z-Image-Turbo API...")
     logger.info("Initializing model (this may take a while)...")
     try:
         generator = get_generator()
         generator.initialize()
         logger.info("Model initialized successfully")
-        logger.info(f"API server ready on http://{settings.API_HOST}:{settings.API_PORT}")
+        get_executor().ensure_workers(generator.streams)
+        get_batcher()
+        get_result_cache()
+        get_metrics()
+        get_job_queue().start(_run_queued_job)
+        # /ready stays at 503 until warm-up has run; /health answers right away
+        _warmup_task = asyncio.create_task(get_warmup().run())
+        logger.info(f"API server listening on http://{settings.API_HOST}:{settings.API_PORT}")
     except Exception as e:
         logger.error(f"Failed to initialize model: {e}")
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job dispatcher and inference workers on shutdown"""
+    await get_job_queue().stop()
+    get_executor().shutdown()
+
+
+class RequestMetricsMiddleware:
+    """
+    Count requests and time them until the response is sent
+
+    A plain ASGI middleware rather than @app.middleware("http"): Starlette's
+    BaseHTTPMiddleware hides client disconnects from request.is_disconnected(),
+    which cancelling abandoned generations relies on.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = {}
+
+        async def send_and_record(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = dict(message.get("headers", []))
+                response["content_type"] = headers.get(b"content-type", b"").decode("latin-1")
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
+
+        # The router sets the matched route on the shared scope
+        route = scope.get("route")
+        # Streams stay open for the whole generation; their stages are timed individually
+        streamed = response.get("content_type", "").startswith(("text/event-stream", "application/x-ndjson"))
+        if route is not None and route.path != "/metrics" and "status" in response and not streamed:
+            metrics = get_metrics()
+            labels = {"path": route.path, "status": response["status"]}
+            metrics.requests.inc(**labels)
+            metrics.request.observe(time.perf_counter() - start, **labels)
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def _server_busy(e: QueueFullError) -> HTTPException:
+    """Build a 503 response for a full inference queue"""
+    logger.warning(f"Rejecting generation request, inference queue is full (retry after {e.retry_after}s)")
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def _over_budget(e: AdmissionRejected) -> HTTPException:
+    """Build a 503 response for a request that would finish after the latency budget"""
+    logger.warning(f"Rejecting generation request, estimated completion in {e.estimated_seconds:.0f}s "
+                   f"exceeds the latency budget (retry after {e.retry_after}s)")
+    get_metrics().admission_rejected.inc()
+    return HTTPException(
+        status_code=503,
+        detail="Server is overloaded, please retry later",
+        headers={"Retry-After": str(e.retry_after), "X-Estimated-Completion": f"{e.estimated_seconds:.1f}"}
+    )
+
+
+def _deadline_missed(e: DeadlineExceededError) -> HTTPException:
+    """Build a 504 response for a request that cannot finish before its X-Deadline"""
+    logger.warning(f"Rejecting generation request: {e}")
+    if e.estimated_seconds is not None:
+        get_metrics().deadline_missed.inc(stage="admission")
+    return HTTPException(status_code=504, detail=str(e))
+
+
+def _deadline(http_request: Request) -> Optional[float]:
+    """
+    The X-Deadline header as a time.monotonic() value, None if absent
+
+    The header is either seconds from now or a Unix timestamp.
+    """
+    value = http_request.headers.get("x-deadline")
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Deadline must be seconds from now or a Unix timestamp")
+    if seconds > 1e9:
+        seconds -= time.time()
+    if seconds <= 0:
+        raise HTTPException(status_code=504, detail="X-Deadline has already passed")
+    return time.monotonic() + seconds
+
+
+def _authenticate(http_request: Request) -> Client:
+    """The caller identified by the X-API-Key header, anonymous if keys are optional and none was sent"""
+    try:
+        return get_client_registry().authenticate(http_request.headers.get("x-api-key"))
+    except InvalidApiKeyError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "X-API-Key"})
+
+
+def _acquire(client: Client, images: int = 1) -> ClientSlot:
+    """Reserve a request's images against its key's limits, or reject it with 429"""
+    try:
+        return client.acquire(images)
+    except RateLimitedError as e:
+        logger.warning(f"Rejecting request from {client.name}: {e} (retry after {e.retry_after}s)")
+        get_metrics().rate_limited.inc(client=client.name, reason=e.reason)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def _acquire_waiting(client: Client, images: int = 1) -> ClientSlot:
+    """Reserve images against a key's limits, waiting for room instead of failing"""
+    while True:
+        try:
+            return client.acquire(images)
+        except RateLimitedError as e:
+            await asyncio.sleep(min(e.delay, 5))
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -64,8 +290,15 @@ async def root():
         "endpoints": {
             "generate_file": "/generate/file - Generate and return image file directly",
             "generate_url": "/generate/url - Generate and return image URL",
+            "generate_stream": "/generate/stream - Generate with Server-Sent Events progress and previews",
+            "generate_batch": "/generate/batch - Generate many images in one call, results streamed as NDJSON",
+            "jobs": "/jobs - Submit an asynchronous job, poll /jobs/{id} and fetch /jobs/{id}/result",
             "preview": "/images/{filename} - Preview generated image",
-            "health": "/health - Health check"
+            "health": "/health - Health check",
+            "ready": "/ready - Readiness check, 503 until warm-up has finished",
+            "info": "/info - Model, device and OpenVINO performance settings",
+            "stats": "/stats - Inference queue, batching and cache statistics",
+            "metrics": "/metrics - Prometheus metrics with per-stage timings"
         }
     }
 
@@ -76,64 +309,287 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/generate/file", response_class=FileResponse)
-async def generate_image_file(request: GenerationRequest):
-    """
-    Generate image and return the file directly
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check endpoint, only ready once warm-up has finished"""
+    status = get_warmup().get_status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={"status": "ready" if status["ready"] else "warming_up", "warmup": status}
+    )
 
-    This endpoint generates an image and returns it as a file response.
-    """
-    try:
-        logger.info(f"Received file generation request: {request.prompt[:50]}...")
 
-        generator = get_generator()
-        image, filename = generator.generate_image(
+@app.get("/info")
+async def info():
+    """Model variants, device and OpenVINO compile settings, requested and applied"""
+    return get_model_registry().get_info()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: per-stage timings, request counters, queue depth and memory"""
+    metrics = get_metrics()
+    metrics.queue_depth.set(get_executor().get_stats()["queued"], queue="inference")
+    metrics.queue_depth.set((await asyncio.to_thread(get_job_queue().get_stats))["queued"], queue="jobs")
+    metrics.estimated_backlog.set(get_admission().backlog_seconds)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def stats():
+    """Inference queue, batching and cache statistics"""
+    return {
+        "executor": get_executor().get_stats(),
+        "admission": get_admission().get_stats(),
+        "degradation": get_degrader().get_stats(),
+        "clients": get_client_registry().get_stats(),
+        "models": get_model_registry().get_stats(),
+        "batching": get_batcher().get_stats(),
+        "prompt_cache": get_embedding_cache().get_stats(),
+        "result_cache": get_result_cache().get_stats(),
+        "storage": get_image_store().get_stats(),
+        "jobs": await asyncio.to_thread(get_job_queue().get_stats),
+        "cancellation": {
+            "client_disconnects": _client_disconnects,
+            **get_generator().get_stats()
+        }
+    }
+
+
+def _resolve_job(request: GenerationRequest, allow_multiple: bool = False,
+                 client: Optional[Client] = None, deadline: Optional[float] = None) -> GenerationJob:
+    """Turn an API request into a generation job with server defaults applied"""
+    if request.multiple and not allow_multiple:
+        raise HTTPException(status_code=400, detail="num_images and seeds are only supported by /generate/url")
+    try:
+        return get_generator().resolve_job(
             prompt=request.prompt,
             height=request.height,
             width=request.width,
             num_inference_steps=request.num_inference_steps,
             guidance_scale=request.guidance_scale,
-            seed=request.seed
+            seed=request.seed,
+            encode=resolve_encode_options(
+                format=request.format,
+                quality=request.quality,
+                compress_level=request.compress_level,
+                lossless=request.lossless
+            ),
+            model=request.model,
+            priority=client.priority if client is not None else None,
+            client=client.name if client is not None else None,
+            deadline=deadline
         )
+    except (BucketPolicyError, UnknownModelError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        filepath = generator.get_image_path(filename)
 
-        return FileResponse(
-            path=str(filepath),
-            media_type="image/png",
-            filename=filename,
-            headers={
-                "X-Generated-Filename": filename
-            }
+def _resolve_jobs(request: GenerationRequest, client: Optional[Client] = None,
+                  deadline: Optional[float] = None) -> list[GenerationJob]:
+    """
+    Turn a request for one or more images of the same prompt into jobs
+
+    Each image gets its own seed, so it matches what a single request with
+    that seed would produce.
+    """
+    job = _resolve_job(request, allow_multiple=True, client=client, deadline=deadline)
+    seeds = request.seeds
+    if seeds is None:
+        if not request.multiple:
+            return [job]
+        base = request.seed if request.seed is not None else random.randrange(2 ** 31)
+        seeds = [base + i for i in range(request.num_images)]
+    elif request.num_images is not None and request.num_images != len(seeds):
+        raise HTTPException(status_code=400,
+                            detail=f"num_images is {request.num_images} but {len(seeds)} seeds were given")
+    return [dataclasses.replace(job, seed=seed) for seed in seeds]
+
+
+def _degrade(request: GenerationRequest, jobs: list[GenerationJob]) -> tuple[list[GenerationJob], bool]:
+    """
+    Cheaper jobs for a request that accepts lower quality, while the server is overloaded
+
+    Returns:
+        tuple: (jobs to run, whether they were degraded)
+    """
+    if not request.allow_degraded:
+        return jobs, False
+    wait = get_admission().backlog_seconds / get_generator().streams
+    degraded = get_degrader().degrade(jobs, wait)
+    return degraded, degraded is not jobs
+
+
+def _quality_headers(job: GenerationJob, degraded: bool) -> dict:
+    """Response headers with the parameters the image was actually generated with"""
+    return {
+        "X-Degraded": "true" if degraded else "false",
+        "X-Num-Inference-Steps": str(job.num_inference_steps),
+        "X-Render-Size": "%dx%d" % job.run_size,
+    }
+
+
+def _result_cache_key(job: GenerationJob) -> Optional[str]:
+    """Result cache key for deterministic (seeded) jobs, None if not cacheable"""
+    if not settings.RESULT_CACHE_ENABLED or job.seed is None:
+        return None
+    return get_result_cache().make_key(job, get_generator().model_id_for(job))
+
+
+def _admit(jobs: list[GenerationJob], cache_key: Optional[str] = None, enforce: bool = True) -> Ticket:
+    """
+    Admit the estimated cost of generating jobs that share one batch key
+
+    Results that the result cache already holds cost nothing and are always
+    admitted.
+
+    Raises:
+        AdmissionRejected: If the request would finish after the latency budget
+        DeadlineExceededError: If it would finish after the client's X-Deadline
+    """
+    if cache_key is not None and get_result_cache().contains(cache_key):
+        return Ticket(None, 0.0, 0.0)
+    return get_admission().admit(jobs[0].model, sum(job.work_units for job in jobs),
+                                 parallelism=get_generator().streams, enforce=enforce,
+                                 deadline=jobs[0].deadline)
+
+
+def _estimate_header(ticket: Ticket) -> dict:
+    """Response header with the completion time estimated when the request was admitted"""
+    return {"X-Estimated-Completion": f"{ticket.estimated_completion:.1f}"}
+
+
+async def _generate(job: GenerationJob, cache_key: Optional[str]) -> tuple[bytes, Optional[str]]:
+    """
+    Generate a job's encoded image, through the result cache when it has a key
+
+    Returns:
+        tuple: (encoded image bytes, cache source or None if not cacheable)
+    """
+    if cache_key is None:
+        return (await get_batcher().submit(job)).data, None
+
+    async def create() -> bytes:
+        return (await get_batcher().submit(job)).data
+
+    return await get_result_cache().get_or_create(cache_key, create)
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before generation finished"""
+
+
+async def _until_disconnected(http_request: Request, awaitable):
+    """Await a generation, cancelling it if the client disconnects first"""
+    global _client_disconnects
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                _client_disconnects += 1
+                logger.info("Client disconnected, cancelling generation")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+@app.post("/generate/file", response_class=Response)
+async def generate_image_file(request: GenerationRequest, http_request: Request):
+    """
+    Generate image and return the file directly
+
+    This endpoint generates an image and returns the encoded bytes from
+    memory. With PERSIST_FILE_OUTPUTS the image is also saved to the output
+    directory after the response has been sent. Seeded requests are served
+    from the result cache when possible and carry an ETag, so clients can
+    revalidate with If-None-Match.
+    """
+    try:
+        logger.info(f"Received file generation request: {request.prompt[:50]}...")
+
+        generator = get_generator()
+        client = _authenticate(http_request)
+        job = _resolve_job(request, client=client, deadline=_deadline(http_request))
+        [job], degraded = _degrade(request, [job])
+
+        headers = _quality_headers(job, degraded)
+        cache_key = _result_cache_key(job)
+        if cache_key is not None:
+            etag = f'"{cache_key}"'
+            if_none_match = http_request.headers.get("if-none-match", "")
+            if etag in [tag.strip() for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers={"ETag": etag})
+
+        with _acquire(client), _admit([job], cache_key) as ticket:
+            data, source = await _until_disconnected(http_request, _generate(job, cache_key))
+        headers.update(_estimate_header(ticket))
+        if cache_key is not None:
+            headers.update({"ETag": etag, "X-Cache": source})
+
+        # Send the encoded bytes right away; saving to disk happens after the response
+        filename = generator.new_filename(job.encode.extension)
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        background = None
+        if settings.PERSIST_FILE_OUTPUTS:
+            headers["X-Generated-Filename"] = filename
+            background = BackgroundTask(generator.save_encoded, data, filename=filename)
+
+        return Response(
+            content=data,
+            media_type=job.encode.media_type,
+            headers=headers,
+            background=background
         )
 
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise _server_busy(e)
+    except AdmissionRejected as e:
+        raise _over_budget(e)
+    except DeadlineExceededError as e:
+        raise _deadline_missed(e)
+    except ClientDisconnected:
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"Image generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 
 @app.post("/generate/url", response_model=GenerationResponse)
-async def generate_image_url(request: GenerationRequest, http_request: Request):
+async def generate_image_url(request: GenerationRequest, http_request: Request, response: Response):
     """
     Generate image and return URL for preview
 
-    This endpoint generates an image and returns URLs to access it.
+    This endpoint generates an image and returns URLs to access it. With
+    num_images or seeds it generates several variations of the prompt in one
+    pipeline batch, encoding the prompt once, and lists them all in images.
     """
     try:
         logger.info(f"Received URL generation request: {request.prompt[:50]}...")
 
         generator = get_generator()
-        image, filename = generator.generate_image(
-            prompt=request.prompt,
-            height=request.height,
-            width=request.width,
-            num_inference_steps=request.num_inference_steps,
-            guidance_scale=request.guidance_scale,
-            seed=request.seed
-        )
+        client = _authenticate(http_request)
+        jobs, degraded = _degrade(request, _resolve_jobs(request, client, _deadline(http_request)))
+        response.headers.update(_quality_headers(jobs[0], degraded))
+        base_url = str(http_request.base_url).rstrip('/')
+        if len(jobs) > 1:
+            with _acquire(client, len(jobs)), _admit(jobs) as ticket:
+                result = await _generate_group(jobs, http_request, base_url)
+            response.headers.update(_estimate_header(ticket))
+            return result
+
+        job = jobs[0]
+        cache_key = _result_cache_key(job)
+        with _acquire(client), _admit([job], cache_key) as ticket:
+            data, _ = await _until_disconnected(http_request, _generate(job, cache_key))
+        response.headers.update(_estimate_header(ticket))
+        filename = await asyncio.to_thread(generator.save_encoded, data, job.encode.extension)
 
         # Construct URLs
-        base_url = str(http_request.base_url).rstrip('/')
         image_url = f"{base_url}/images/{filename}"
         preview_url = image_url  # Same URL for preview
 
@@ -145,6 +601,16 @@ async def generate_image_url(request: GenerationRequest, http_request: Request):
             preview_url=preview_url
         )
 
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise _server_busy(e)
+    except AdmissionRejected as e:
+        raise _over_budget(e)
+    except DeadlineExceededError as e:
+        raise _deadline_missed(e)
+    except ClientDisconnected:
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"Image generation failed: {e}")
         return GenerationResponse(
@@ -153,6 +619,318 @@ async def generate_image_url(request: GenerationRequest, http_request: Request):
         )
 
 
+async def _generate_group(jobs: list[GenerationJob], http_request: Request, base_url: str) -> GenerationResponse:
+    """Generate the images of a multi-image request as one batch and save them all"""
+    generator = get_generator()
+    results = await _until_disconnected(http_request, get_batcher().submit_group(jobs))
+    filenames = await asyncio.to_thread(
+        lambda: [generator.save_encoded(result.data, job.encode.extension) for job, result in zip(jobs, results)]
+    )
+    images = [
+        ImageResult(seed=job.seed, filename=filename, image_url=f"{base_url}/images/{filename}")
+        for job, filename in zip(jobs, filenames)
+    ]
+    return GenerationResponse(
+        success=True,
+        message=f"{len(images)} images generated successfully",
+        image_url=images[0].image_url,
+        filename=images[0].filename,
+        preview_url=images[0].image_url,
+        images=images
+    )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/generate/stream")
+async def generate_image_stream(request: StreamRequest, http_request: Request):
+    """
+    Generate image and stream progress as Server-Sent Events
+
+    Emits "queued" and "started" events, one "progress" event per denoising
+    step (with elapsed time, ETA and optional latent previews), then a
+    "complete" event with the image URL, or an "error" event.
+    """
+    try:
+        logger.info(f"Received stream generation request: {request.prompt[:50]}...")
+
+        generator = get_generator()
+        client = _authenticate(http_request)
+        job = _resolve_job(request, client=client, deadline=_deadline(http_request))
+        [job], degraded = _degrade(request, [job])
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        preview_options = EncodeOptions(format="jpeg", quality=70)
+        submitted_at = time.monotonic()
+        timing = {}
+
+        def emit(kind: str, payload: Optional[dict]):
+            # Called from the inference worker thread
+            loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+
+        def on_step(step: int, total: int, latents):
+            elapsed = time.monotonic() - timing["started_at"]
+            payload = {
+                "step": step,
+                "total": total,
+                "elapsed": round(elapsed, 3),
+                "eta": round(elapsed / step * max(total - step, 0), 3),
+            }
+            if request.previews and latents is not None and (step % request.preview_interval == 0 or step == total):
+                preview = encode_image(latent_preview(latents), preview_options)
+                payload["preview"] = to_data_uri(preview, preview_options.media_type)
+            emit("progress", payload)
+
+        def run():
+            timing["started_at"] = time.monotonic()
+            emit("started", {"queue_wait": round(timing["started_at"] - submitted_at, 3)})
+            return generator.generate_batch([job], on_step)
+
+        slot = _acquire(client)
+        try:
+            ticket = _admit([job])
+        except (AdmissionRejected, DeadlineExceededError):
+            slot.release()
+            raise
+        try:
+            future = get_executor().submit(run, priority=job.priority, cost=generator.estimate_seconds([job]),
+                                           deadline=job.deadline, expires=job.deadline)
+        except QueueFullError:
+            ticket.release()
+            slot.release()
+            raise
+        future.add_done_callback(lambda _: ticket.release())
+        future.add_done_callback(lambda _: slot.release())
+        future.add_done_callback(lambda _: events.put_nowait(("done", None)))
+
+    except QueueFullError as e:
+        raise _server_busy(e)
+    except AdmissionRejected as e:
+        raise _over_budget(e)
+    except DeadlineExceededError as e:
+        raise _deadline_missed(e)
+
+    async def event_stream():
+        global _client_disconnects
+        completed = False
+        try:
+            yield _sse_event("queued", {"queue": get_executor().get_stats()["queued"],
+                                        "estimated_completion": round(ticket.estimated_completion, 1)})
+            while True:
+                kind, payload = await events.get()
+                if kind == "done":
+                    break
+                yield _sse_event(kind, payload)
+
+            try:
+                result = future.result()[0]
+            except Exception as e:
+                logger.error(f"Image generation failed: {e}")
+                completed = True
+                yield _sse_event("error", {"message": f"Image generation failed: {str(e)}"})
+                return
+
+            filename = await asyncio.to_thread(generator.save_encoded, result.data, job.encode.extension)
+            base_url = str(http_request.base_url).rstrip('/')
+            complete = {
+                "filename": filename,
+                "image_url": f"{base_url}/images/{filename}",
+                "elapsed": round(time.monotonic() - submitted_at, 3),
+                "degraded": degraded,
+                "num_inference_steps": job.num_inference_steps,
+                "render_size": "%dx%d" % job.run_size,
+            }
+            if request.return_image:
+                complete["image"] = to_data_uri(result.data, job.encode.media_type)
+            completed = True
+            yield _sse_event("complete", complete)
+        finally:
+            if not completed:
+                # Client went away: drop the job if queued, abort it at the next step if running
+                _client_disconnects += 1
+                logger.info("Stream client disconnected, cancelling generation")
+                job.cancel()
+                future.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **_estimate_header(ticket),
+                 **_quality_headers(job, degraded)}
+    )
+
+
+@app.post("/generate/batch")
+async def generate_image_batch(request: BatchGenerationRequest, http_request: Request):
+    """
+    Generate many images in one call and stream results as NDJSON
+
+    Items that share a model, resolution, steps and guidance are scheduled
+    next to each other so the batcher merges them into pipeline batches.
+    One JSON line is sent per item as soon as it finishes, in completion
+    order and tagged with the item's index; an item that fails is reported
+    on its own line without affecting the others. A final "summary" line
+    closes the stream.
+    """
+    logger.info(f"Received batch generation request with {len(request.items)} item(s)")
+    generator = get_generator()
+    client = _authenticate(http_request)
+    base_url = str(http_request.base_url).rstrip('/')
+    submitted_at = time.monotonic()
+    lines: asyncio.Queue = asyncio.Queue()
+
+    jobs: dict[int, GenerationJob] = {}
+    for index, item in enumerate(request.items):
+        try:
+            jobs[index] = _resolve_job(GenerationRequest.model_validate(item), client=client)
+        except ValidationError as e:
+            lines.put_nowait({"index": index, "success": False, "status": 422,
+                              "error": e.errors(include_url=False, include_context=False)})
+        except HTTPException as e:
+            lines.put_nowait({"index": index, "success": False, "status": e.status_code, "error": e.detail})
+
+    # Enough items in flight to fill every stream's batches; the rest wait here, not in the executor queue
+    window = asyncio.Semaphore(max(1, settings.BATCH_MAX_SIZE * generator.streams * 2))
+
+    async def run(index: int):
+        job = jobs[index]
+        try:
+            async with window:
+                cache_key = _result_cache_key(job)
+                # Already accepted with the batch: items wait for the key's limits and are
+                # counted in the backlog, but never rejected
+                with await _acquire_waiting(client), _admit([job], cache_key, enforce=False):
+                    while True:
+                        try:
+                            data, _ = await _generate(job, cache_key)
+                            break
+                        except QueueFullError as e:
+                            # Other traffic filled the queue; wait for a slot instead of failing the item
+                            await asyncio.sleep(min(e.retry_after, 5))
+            filename = await asyncio.to_thread(generator.save_encoded, data, job.encode.extension)
+            line = {"index": index, "success": True, "filename": filename,
+                    "image_url": f"{base_url}/images/{filename}"}
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            line = {"index": index, "success": False, "status": 500, "error": f"Image generation failed: {str(e)}"}
+        await lines.put(line)
+
+    async def ndjson_stream():
+        global _client_disconnects
+        # Same-shape items next to each other, in request order within a shape
+        order = sorted(jobs, key=lambda i: (str(jobs[i].batch_key), i))
+        tasks = [asyncio.create_task(run(index)) for index in order]
+        succeeded = 0
+        completed = False
+        try:
+            for _ in range(len(request.items)):
+                line = await lines.get()
+                succeeded += line["success"]
+                yield json.dumps(line) + "\n"
+            completed = True
+            yield json.dumps({"summary": {
+                "items": len(request.items),
+                "succeeded": succeeded,
+                "failed": len(request.items) - succeeded,
+                "elapsed": round(time.monotonic() - submitted_at, 3),
+            }}) + "\n"
+        finally:
+            if not completed:
+                # Client went away: drop queued items and abort running ones at the next step
+                _client_disconnects += 1
+                logger.info("Batch client disconnected, cancelling remaining items")
+                for task in tasks:
+                    task.cancel()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+async def _run_queued_job(job: GenerationJob) -> str:
+    """Generate a job from the persistent queue and save its image"""
+    cache_key = _result_cache_key(job)
+    # Jobs were accepted when queued: they wait for their key's limits instead of failing
+    client = get_client_registry().client_named(job.client)
+    with await _acquire_waiting(client), _admit([job], cache_key, enforce=False):
+        data, _ = await _generate(job, cache_key)
+    return await asyncio.to_thread(get_generator().save_encoded, data, job.encode.extension)
+
+
+def _job_status(record: JobRecord, http_request: Request) -> JobStatusResponse:
+    base_url = str(http_request.base_url).rstrip('/')
+    return JobStatusResponse(
+        id=record.id,
+        status=record.status,
+        queue_position=record.queue_position,
+        created_at=record.created_at,
+        started_at=record.started_at,
+        finished_at=record.finished_at,
+        status_url=f"{base_url}/jobs/{record.id}",
+        result_url=f"{base_url}/jobs/{record.id}/result" if record.status == COMPLETED else None,
+        error=record.error
+    )
+
+
+@app.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_job(request: GenerationRequest, http_request: Request):
+    """
+    Queue an image generation and return immediately
+
+    The job is persisted before this endpoint returns, so it survives a
+    server restart. Poll /jobs/{id} for its status and fetch the image
+    from /jobs/{id}/result once it has completed.
+    """
+    try:
+        record = await get_job_queue().submit(_resolve_job(request, client=_authenticate(http_request)))
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting job: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, please retry later",
+            headers={"Retry-After": str(settings.INFERENCE_RETRY_AFTER)}
+        )
+
+    logger.info(f"Queued job {record.id}: {request.prompt[:50]}...")
+    return _job_status(record, http_request)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, http_request: Request):
+    """Get a job's status and, while it waits, the number of jobs ahead of it"""
+    record = await get_job_queue().get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(record, http_request)
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the image produced by a completed job
+
+    Returns 409 while the job is still queued or running.
+    """
+    record = await get_job_queue().get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if record.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Image generation failed: {record.error}")
+    if record.status != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {record.status}")
+
+    image_path = get_generator().get_image_path(record.filename)
+    if not image_path.exists():
+        raise HTTPException(status_code=410, detail="Job image has been deleted")
+
+    return FileResponse(
+        path=image_path,
+        media_type=media_type_for(record.filename),
+        filename=record.filename
+    )
+
+
 @app.get("/images/{filename}")
 async def preview_image(filename: str):
     """
@@ -169,7 +947,7 @@ async def preview_image(filename: str):
 
         return FileResponse(
             path=str(filepath),
-            media_type="image/png",
+            media_type=media_type_for(filename),
             filename=filename
         )
 
@@ -0,0 +1,270 @@
+"""
+API keys, priority classes and per-key limits for Z-Image-Turbo
+
+Callers identify themselves with an X-API-Key header. Each key belongs to a
+priority class (such as interactive or bulk) whose weight sets its share of
+the inference workers in the fair-queuing scheduler, and may carry a
+concurrency limit and a token-bucket rate limit, counted in images.
+
+Keys, classes and limits are read from a local JSON file (API_KEYS_FILE):
+
+    {
+      "classes": {"interactive": 8, "bulk": 1},
+      "anonymous": {"priority": "interactive", "max_concurrency": 2},
+      "keys": {
+        "k-web-1234": {"name": "web", "priority": "interactive", "rate": 2, "burst": 10},
+        "k-etl-5678": {"name": "etl", "priority": "bulk", "max_concurrency": 16}
+      }
+    }
+
+Without a file every caller is anonymous and unlimited, and all work shares
+one class.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from config import PROJECT_ROOT, settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = "interactive"
+DEFAULT_CLASSES = {"interactive": 4.0, "bulk": 1.0}  # Class name -> scheduling weight
+
+
+class InvalidApiKeyError(ValueError):
+    """Raised for an unknown API key, or a missing one when keys are required"""
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when a key is over its rate or concurrency limit"""
+
+    def __init__(self, reason: str, delay: float):
+        super().__init__(f"API key is over its {reason} limit")
+        self.reason = reason
+        self.delay = delay  # Seconds until the request would be accepted
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.delay))
+
+
+@dataclass
+class ClientPolicy:
+    """Limits configured for one API key"""
+    name: str
+    priority: str = DEFAULT_PRIORITY
+    max_concurrency: int = 0  # Images in flight at once (0 = unlimited)
+    rate: float = 0.0  # Images per second refilled into the token bucket (0 = unlimited)
+    burst: float = 0.0  # Token bucket size, at least one request's worth (default: max(1, rate))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """
+        Take tokens if available
+
+        A request larger than the bucket is let through once the bucket is
+        full and leaves it in debt, so big requests are slowed, not refused.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until they will be
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        needed = min(amount, self.burst)
+        if self._tokens >= needed:
+            self._tokens -= amount
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+
+class Client:
+    """Runtime state of one API key: its policy, token bucket and work in flight"""
+
+    def __init__(self, policy: ClientPolicy):
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst or policy.rate) if policy.rate > 0 else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+        self.admitted = 0
+
+    @property
+    def name(self) -> str:
+        return self.policy.name
+
+    @property
+    def priority(self) -> str:
+        return self.policy.priority
+
+    def acquire(self, images: int = 1) -> "ClientSlot":
+        """
+        Reserve room for a request of the given number of images
+
+        Returns:
+            ClientSlot: Release it when the request has finished
+
+        Raises:
+            RateLimitedError: If the key is over its concurrency or rate limit
+        """
+        with self._lock:
+            limit = self.policy.max_concurrency
+            if limit and self.in_flight and self.in_flight + images > limit:
+                raise RateLimitedError("concurrency", settings.INFERENCE_RETRY_AFTER)
+            if self.bucket is not None:
+                delay = self.bucket.take(images)
+                if delay > 0:
+                    raise RateLimitedError("rate", delay)
+            self.in_flight += images
+            self.admitted += 1
+        return ClientSlot(self, images)
+
+    def _release(self, images: int):
+        with self._lock:
+            self.in_flight -= images
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "priority": self.priority,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.policy.max_concurrency,
+                "rate": self.policy.rate,
+                "admitted": self.admitted,
+            }
+
+
+class ClientSlot:
+    """Images reserved by one request, returned to the key when released"""
+
+    def __init__(self, client: Client, images: int):
+        self._client: Optional[Client] = client
+        self.images = images
+
+    def release(self):
+        if self._client is not None:
+            self._client._release(self.images)
+            self._client = None
+
+    def __enter__(self) -> "ClientSlot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class ClientRegistry:
+    """API keys and priority classes loaded from API_KEYS_FILE"""
+
+    def __init__(self, path: Optional[Path] = None, require_key: Optional[bool] = None):
+        self.require_key = require_key if require_key is not None else settings.REQUIRE_API_KEY
+        self.classes: dict[str, float] = dict(DEFAULT_CLASSES)
+        self.anonymous = Client(ClientPolicy(name="anonymous"))
+        self._clients: dict[str, Client] = {}
+        self._by_name: dict[str, Client] = {}
+
+        if path is None and settings.API_KEYS_FILE:
+            path = Path(settings.API_KEYS_FILE)
+            if not path.is_absolute():
+                path = PROJECT_ROOT / path
+        if path is not None:
+            self._load(path)
+        elif self.require_key:
+            raise ValueError("REQUIRE_API_KEY is set but no API_KEYS_FILE is configured")
+
+    def _load(self, path: Path):
+        config = json.loads(path.read_text(encoding="utf-8"))
+        if "classes" in config:
+            self.classes = {name: float(weight) for name, weight in config["classes"].items()}
+        if not self.classes or any(weight <= 0 for weight in self.classes.values()):
+            raise ValueError(f"{path}: every priority class needs a positive weight")
+
+        self.anonymous = Client(self._policy("anonymous", config.get("anonymous", {}), path))
+        for index, (key, entry) in enumerate(config.get("keys", {}).items()):
+            self._clients[key] = Client(self._policy(entry.get("name", f"key-{index + 1}"), entry, path))
+        self._by_name = {client.name: client for client in self._clients.values()}
+        logger.info(f"Loaded {len(self._clients)} API key(s) and priority classes "
+                    f"{self.classes} from {path}")
+
+    def _policy(self, name: str, entry: dict, path: Path) -> ClientPolicy:
+        policy = ClientPolicy(
+            name=name,
+            priority=entry.get("priority", self.default_priority),
+            max_concurrency=int(entry.get("max_concurrency", 0)),
+            rate=float(entry.get("rate", 0)),
+            burst=float(entry.get("burst", 0)),
+        )
+        if policy.priority not in self.classes:
+            raise ValueError(f"{path}: {name} uses unknown priority class '{policy.priority}'")
+        return policy
+
+    @property
+    def default_priority(self) -> str:
+        """Class for work without a key, such as warm-up and queued jobs"""
+        return DEFAULT_PRIORITY if DEFAULT_PRIORITY in self.classes else next(iter(self.classes))
+
+    def authenticate(self, api_key: Optional[str]) -> Client:
+        """
+        Look up the client for an X-API-Key header value
+
+        Raises:
+            InvalidApiKeyError: If the key is unknown, or missing while keys
+                are required
+        """
+        if not api_key:
+            if self.require_key:
+                raise InvalidApiKeyError("Missing X-API-Key header")
+            return self.anonymous
+        client = self._clients.get(api_key)
+        if client is None:
+            raise InvalidApiKeyError("Invalid API key")
+        return client
+
+    def client_named(self, name: Optional[str]) -> Client:
+        """
+        Look up a client by its key name, for work queued under that name
+
+        Falls back to the anonymous client if the key has since been removed.
+        """
+        return self._by_name.get(name, self.anonymous) if name else self.anonymous
+
+    def highest_priority(self, priorities: Iterable[Optional[str]]) -> str:
+        """The class with the largest weight among the given ones"""
+        return max((p or self.default_priority for p in priorities), key=lambda p: self.classes.get(p, 0.0))
+
+    def get_stats(self) -> dict:
+        """Get class weights and per-key usage (by key name, never the key itself)"""
+        clients = [self.anonymous, *self._clients.values()]
+        return {
+            "classes": self.classes,
+            "require_key": self.require_key,
+            "clients": {client.name: client.get_stats() for client in clients},
+        }
+
+
+# Global registry instance
+_registry: Optional[ClientRegistry] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    """Get or create global client registry instance"""
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry()
+    return _registry
@@ -0,0 +1,182 @@
+"""
+Micro-batching scheduler for Z-Image-Turbo
+
+Collects compatible generation requests (same resolution, steps and guidance)
+for a short window and runs them as one list-of-prompts pipeline call.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Optional
+
+from api_keys import get_client_registry
+from config import settings
+from executor import InferenceExecutor, get_executor
+from generator import GeneratedImage, GenerationJob, ImageGenerator, get_generator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    """Jobs collected for one batch key while the wait window is open"""
+
+    def __init__(self):
+        self.entries: list[tuple[GenerationJob, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Groups compatible jobs into batched pipeline calls on the inference executor"""
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        generator: ImageGenerator,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[int] = None
+    ):
+        self.executor = executor
+        self.generator = generator
+        self.max_batch_size = max(1, max_batch_size or settings.BATCH_MAX_SIZE)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.BATCH_MAX_WAIT_MS) / 1000
+
+        self._pending: dict[tuple, _PendingBatch] = {}
+        self._batch_sizes: Counter = Counter()
+        self._dropped = 0
+
+    async def submit(self, job: GenerationJob) -> GeneratedImage:
+        """
+        Queue a job for batching and wait for its own image
+
+        Cancelling the caller marks the job as cancelled. A batch is dropped
+        from the executor queue, or aborted at the next step boundary, once
+        every job in it has been cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(lambda f: job.cancel() if f.cancelled() else None)
+
+        if self.max_batch_size == 1:
+            self._dispatch([(job, future)])
+            return await future
+
+        key = job.batch_key
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingBatch()
+            pending.timer = loop.call_later(self.max_wait, self._flush, key)
+        pending.entries.append((job, future))
+
+        if len(pending.entries) >= self.max_batch_size:
+            self._flush(key)
+
+        return await future
+
+    async def submit_group(self, jobs: list[GenerationJob]) -> list[GeneratedImage]:
+        """
+        Run the jobs of one request (such as a seed sweep) as a single batch
+
+        The group skips the wait window and is never split, so all of its
+        images come from one pipeline pass. Cancelling the caller cancels
+        every job in the group.
+        """
+        loop = asyncio.get_running_loop()
+        entries = []
+        for job in jobs:
+            future = loop.create_future()
+            future.add_done_callback(lambda f, job=job: job.cancel() if f.cancelled() else None)
+            entries.append((job, future))
+
+        self._dispatch(entries)
+        return list(await asyncio.gather(*[future for _, future in entries]))
+
+    def _flush(self, key: tuple):
+        """Close the wait window for a batch key and dispatch its jobs"""
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+
+        # Callers that gave up while the window was open do not need an image
+        entries = [(job, future) for job, future in pending.entries if not future.done()]
+        self._dropped += len(pending.entries) - len(entries)
+        if entries:
+            self._dispatch(entries)
+
+    def _dispatch(self, entries: list[tuple[GenerationJob, asyncio.Future]]):
+        """Submit one batch to the executor and route results back to each caller"""
+        jobs = [job for job, _ in entries]
+        self._batch_sizes[len(jobs)] += 1
+        if len(jobs) > 1:
+            logger.info(f"Dispatching batch of {len(jobs)} jobs")
+
+        try:
+            # A batch is queued in the most important class of its jobs and is due when its
+            # earliest job is; it is only dropped once the last deadline can no longer be met
+            deadlines = [job.deadline for job in jobs]
+            batch_future = self.executor.submit(
+                self.generator.generate_batch, jobs,
+                priority=get_client_registry().highest_priority(job.priority for job in jobs),
+                cost=self.generator.estimate_seconds(jobs),
+                deadline=min((d for d in deadlines if d is not None), default=None),
+                expires=max(deadlines) if None not in deadlines else None
+            )
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        def on_caller_done(_):
+            if all(future.cancelled() for _, future in entries):
+                batch_future.cancel()
+
+        for _, future in entries:
+            future.add_done_callback(on_caller_done)
+        batch_future.add_done_callback(lambda f: self._deliver(entries, f))
+
+    @staticmethod
+    def _deliver(entries: list[tuple[GenerationJob, asyncio.Future]], batch_future: asyncio.Future):
+        if batch_future.cancelled():
+            for _, future in entries:
+                future.cancel()
+            return
+
+        exc = batch_future.exception()
+        results = batch_future.result() if exc is None else [None] * len(entries)
+        for (_, future), result in zip(entries, results):
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """Get batching configuration and achieved batch sizes"""
+        batches = sum(self._batch_sizes.values())
+        images = sum(size * count for size, count in self._batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "images": images,
+            "mean_batch_size": images / batches if batches else 0.0,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "open_batches": len(self._pending),
+            "dropped_before_dispatch": self._dropped,
+        }
+
+
+# Global batcher instance
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_batcher() -> MicroBatcher:
+    """Get or create global micro-batcher instance"""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(get_executor(), get_generator())
+    return _batcher
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark image encoding time and output size for each output format
+
+Uses a generated image (--image) or a synthetic 1024x1024 test image with
+smooth gradients and noise, which compresses roughly like a diffusion output.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageFilter
+
+from imaging import EncodeOptions, encode_image
+
+CASES = [
+    EncodeOptions(format="png", compress_level=0),
+    EncodeOptions(format="png", compress_level=1),
+    EncodeOptions(format="png", compress_level=6),
+    EncodeOptions(format="png", compress_level=9),
+    EncodeOptions(format="jpeg", quality=75),
+    EncodeOptions(format="jpeg", quality=90),
+    EncodeOptions(format="jpeg", quality=95),
+    EncodeOptions(format="webp", quality=75),
+    EncodeOptions(format="webp", quality=90),
+    EncodeOptions(format="webp", lossless=True),
+]
+
+
+def synthetic_image(size: int) -> Image.Image:
+    """Gradient plus blurred noise, a rough stand-in for a generated image"""
+    gradient = Image.linear_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), 64).filter(ImageFilter.GaussianBlur(2))
+    return Image.merge("RGB", (gradient, noise, gradient.rotate(90)))
+
+
+def describe(options: EncodeOptions) -> str:
+    fields = options.cache_fields()
+    return " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+def run(image: Image.Image, repeat: int) -> list[dict]:
+    results = []
+    for options in CASES:
+        encode_image(image, options)  # warm up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = encode_image(image, options)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "case": describe(options),
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "size_kb": len(data) / 1024,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark output format encoding")
+    parser.add_argument("--image", type=Path, help="Image to encode (default: synthetic image)")
+    parser.add_argument("--size", type=int, default=1024, help="Synthetic image size (default: 1024)")
+    parser.add_argument("--repeat", type=int, default=5, help="Encodes per case (default: 5)")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else synthetic_image(args.size)
+    print(f"Image: {image.width}x{image.height}, {args.repeat} encodes per case")
+    print("=" * 60)
+    print(f"{'case':<32}{'median ms':>10}{'min ms':>9}{'size KB':>10}")
+    print("-" * 60)
+
+    results = run(image, args.repeat)
+    for result in results:
+        print(f"{result['case']:<32}{result['median_ms']:>10.1f}{result['min_ms']:>9.1f}{result['size_kb']:>10.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
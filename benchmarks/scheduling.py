@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""
+Compare scheduling policies in a simulation of the inference queue
+
+Runs a discrete-event simulation of the executor: Poisson arrivals of a mix
+of request shapes, served by a number of workers, ordered by the server's
+own FairQueue under each policy (fifo, sjf, edf). Runtimes are the cost
+model's estimate with random noise, so shortest-job-first works from
+estimates as it does in the server. A share of requests carries a deadline;
+those are rejected on arrival or dropped from the queue when they can no
+longer meet it, as the server does.
+
+Reports mean and tail latency overall and per shape, the longest wait of
+the largest shape (starvation under sjf) and deadline outcomes.
+
+    python benchmarks/scheduling.py --load 0.9
+    python benchmarks/scheduling.py --mix 512x512x9:0.8,1024x1024x50:0.2 --aging 0.2
+"""
+import argparse
+import heapq
+import json
+import math
+import random
+import statistics
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from admission import work_units
+from scheduler import POLICIES, FairQueue, misses_deadline
+
+
+class SimTask:
+    """The attributes FairQueue and misses_deadline read from an inference task"""
+
+    def __init__(self, index: int, shape: str, cost: float, runtime: float, arrival: float,
+                 deadline: Optional[float]):
+        self.index = index
+        self.shape = shape
+        self.priority = None
+        self.cost = cost
+        self.runtime = runtime
+        self.enqueued_at = arrival
+        self.deadline = deadline
+        self.expires = deadline
+        self.virtual_arrival = 0.0
+        self.finish_tag = 0.0
+
+
+def parse_mix(value: str) -> list[tuple[str, int, int, int, float]]:
+    """Parse HEIGHTxWIDTHxSTEPS:WEIGHT,... into (label, height, width, steps, weight)"""
+    mix = []
+    for item in value.split(","):
+        shape, _, weight = item.strip().partition(":")
+        height, width, steps = (int(part) for part in shape.split("x"))
+        mix.append((shape, height, width, steps, float(weight or 1)))
+    return mix
+
+
+def make_workload(args: argparse.Namespace) -> list[dict]:
+    """Arrivals for the configured mix, scaled so the workers are busy --load of the time"""
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    total_weight = sum(weight for *_, weight in mix)
+    mean_cost = sum(args.overhead + work_units(h, w, s) * args.step_seconds * weight
+                    for _, h, w, s, weight in mix) / total_weight
+    rate = args.load * args.workers / mean_cost
+
+    workload = []
+    at = 0.0
+    for index in range(args.requests):
+        at += rng.expovariate(rate)
+        label, height, width, steps, _ = rng.choices(mix, weights=[m[4] for m in mix])[0]
+        cost = args.overhead + work_units(height, width, steps) * args.step_seconds
+        runtime = cost * math.exp(rng.gauss(0, args.noise))
+        deadline = None
+        if rng.random() < args.deadline_share:
+            deadline = at + cost * args.deadline_slack
+        workload.append({"index": index, "shape": label, "cost": cost, "runtime": runtime,
+                         "arrival": at, "deadline": deadline})
+    return workload
+
+
+def simulate(policy: str, workload: list[dict], args: argparse.Namespace) -> dict:
+    """Serve the workload under one policy and collect per-request outcomes"""
+    queue = FairQueue({"default": 1.0}, "default", policy=policy, aging=args.aging,
+                      default_deadline=args.default_deadline)
+    events = [(item["arrival"], 0, item["index"]) for item in workload]  # (time, kind, index); 0 arrival, 1 done
+    heapq.heapify(events)
+    tasks: dict[int, SimTask] = {}
+    free = args.workers
+    backlog = 0.0  # Estimated seconds of admitted work not yet finished
+    outcomes = {"latency": {}, "wait": {}, "rejected": 0, "dropped": 0, "late": 0, "met": 0}
+
+    def dispatch(now: float):
+        nonlocal free, backlog
+        while free and queue:
+            task = queue.pop()
+            if misses_deadline(task, now):
+                outcomes["dropped"] += 1
+                backlog -= task.cost
+                continue
+            free -= 1
+            outcomes["wait"][task.index] = now - task.enqueued_at
+            heapq.heappush(events, (now + task.runtime, 1, task.index))
+
+    while events:
+        now, kind, index = heapq.heappop(events)
+        if kind == 0:
+            item = workload[index]
+            task = SimTask(index, item["shape"], item["cost"], item["runtime"], now, item["deadline"])
+            completion = backlog / args.workers + task.cost
+            if task.deadline is not None and now + completion > task.deadline:
+                outcomes["rejected"] += 1
+                continue
+            tasks[index] = task
+            backlog += task.cost
+            queue.push(task)
+        else:
+            task = tasks[index]
+            free += 1
+            backlog -= task.cost
+            outcomes["latency"][index] = now - task.enqueued_at
+            if task.deadline is not None:
+                outcomes["met" if now <= task.deadline else "late"] += 1
+        dispatch(now)
+    return outcomes
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(policy: str, outcomes: dict, workload: list[dict]) -> dict:
+    latencies = list(outcomes["latency"].values())
+    result = {
+        "policy": policy,
+        "completed": len(latencies),
+        "mean_s": statistics.mean(latencies),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "shapes": {},
+        "deadlines": {key: outcomes[key] for key in ("met", "late", "rejected", "dropped")},
+    }
+    for shape in dict.fromkeys(item["shape"] for item in workload):
+        indices = [item["index"] for item in workload if item["shape"] == shape and item["index"] in outcomes["latency"]]
+        if not indices:
+            continue
+        shape_latencies = [outcomes["latency"][i] for i in indices]
+        result["shapes"][shape] = {
+            "completed": len(indices),
+            "mean_s": statistics.mean(shape_latencies),
+            "p95_s": percentile(shape_latencies, 95),
+            "p99_s": percentile(shape_latencies, 99),
+            "max_wait_s": max(outcomes["wait"][i] for i in indices),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the inference queue under each scheduling policy")
+    parser.add_argument("--policies", type=str, default=",".join(POLICIES),
+                        help=f"Comma-separated policies (default: {','.join(POLICIES)})")
+    parser.add_argument("--mix", type=str, default="512x512x9:0.8,1024x1024x50:0.2",
+                        help="Request shapes HEIGHTxWIDTHxSTEPS:WEIGHT (default: 512x512x9:0.8,1024x1024x50:0.2)")
+    parser.add_argument("--load", type=float, default=0.9, help="Target worker utilisation (default: 0.9)")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel pipeline runs (default: 1)")
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests (default: 20000)")
+    parser.add_argument("--step-seconds", type=float, default=0.5,
+                        help="Runtime per 512x512 denoising step (default: 0.5)")
+    parser.add_argument("--overhead", type=float, default=0.3, help="Fixed runtime per request (default: 0.3)")
+    parser.add_argument("--noise", type=float, default=0.1,
+                        help="Log-normal sigma of actual runtime around the estimate (default: 0.1)")
+    parser.add_argument("--aging", type=float, default=0.5,
+                        help="sjf: seconds of estimated runtime forgiven per second waited (default: 0.5)")
+    parser.add_argument("--deadline-share", type=float, default=0.3,
+                        help="Share of requests sending X-Deadline (default: 0.3)")
+    parser.add_argument("--deadline-slack", type=float, default=4.0,
+                        help="Deadline as a multiple of the request's own runtime (default: 4)")
+    parser.add_argument("--default-deadline", type=float, default=300,
+                        help="edf: deadline for requests without one (default: 300)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    policies = [p.strip() for p in args.policies.split(",") if p.strip()]
+    for policy in policies:
+        if policy not in POLICIES:
+            parser.error(f"Unknown policy '{policy}', expected one of {', '.join(POLICIES)}")
+
+    workload = make_workload(args)
+    shapes = list(dict.fromkeys(item["shape"] for item in workload))
+    print(f"{args.requests} requests, load {args.load:.0%} on {args.workers} worker(s), mix {args.mix}")
+    print("=" * 78)
+    print(f"{'policy':<8}{'mean s':>10}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}"
+          f"{'met':>8}{'late':>7}{'rejected':>10}{'dropped':>9}")
+    print("-" * 78)
+
+    results = []
+    for policy in policies:
+        result = summarize(policy, simulate(policy, workload, args), workload)
+        results.append(result)
+        d = result["deadlines"]
+        print(f"{policy:<8}{result['mean_s']:>10.2f}{result['p50_s']:>10.2f}{result['p95_s']:>10.2f}"
+              f"{result['p99_s']:>10.2f}{d['met']:>8}{d['late']:>7}{d['rejected']:>10}{d['dropped']:>9}")
+
+    print(f"\n{'policy':<8}{'shape':<16}{'mean s':>10}{'p95 s':>10}{'p99 s':>10}{'max wait s':>12}")
+    print("-" * 66)
+    for result in results:
+        for shape in shapes:
+            s = result["shapes"].get(shape)
+            if s:
+                print(f"{result['policy']:<8}{shape:<16}{s['mean_s']:>10.2f}{s['p95_s']:>10.2f}"
+                      f"{s['p99_s']:>10.2f}{s['max_wait_s']:>12.2f}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"settings": vars(args) | {"json": str(args.json)}, "results": results},
+                                        indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Benchmark the serving layer: throughput, latency and memory per endpoint
+
+Starts the API server with the simulated pipeline backend (or targets an
+already running server with --url) and, for each endpoint and concurrency
+level, sends requests from that many concurrent clients. Reports requests
+per second, p50/p95/p99 latency and the server's resident memory, read from
+/metrics. With the simulated backend the model cost is fixed, so changes in
+these numbers come from the FastAPI, batching, caching and storage layers.
+
+    python benchmarks/serving.py --json baseline.json
+    python benchmarks/serving.py --baseline baseline.json
+
+With --baseline the run is compared against an earlier result file and the
+script exits with status 1 if throughput dropped or p95 latency grew by more
+than --tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PROMPT = "A lighthouse on a rocky coast at sunset, dramatic clouds, photorealistic"
+ENDPOINTS = ("file", "url", "image")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def start_server(port: int, args: argparse.Namespace, workdir: Path) -> subprocess.Popen:
+    """Start the API with the simulated backend and wait until it is ready"""
+    env = {
+        **os.environ,
+        "PIPELINE_BACKEND": "simulated",
+        "SIMULATED_STEP_MS": str(args.step_ms),
+        "SIMULATED_DECODE_MS": str(args.decode_ms),
+        "SIMULATED_TEXT_ENCODER_MS": str(args.text_encoder_ms),
+        "MODEL_CACHE_ENABLED": "false",
+        "RESULT_CACHE_ENABLED": "false",
+        "OUTPUT_DIR": str(workdir / "images"),
+        "RESULT_CACHE_DIR": str(workdir / "result_cache"),
+        "JOBS_DB": str(workdir / "jobs.db"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env
+    )
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not become ready within 120s")
+
+
+def server_rss(base_url: str) -> Optional[int]:
+    """Resident memory of the server process as exported on /metrics"""
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=10).text
+    except requests.RequestException:
+        return None
+    for line in text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return int(float(line.split()[1]))
+    return None
+
+
+def make_request(endpoint: str, base_url: str, args: argparse.Namespace, index: int,
+                 image_filename: Optional[str]):
+    """Return a function that sends one request and returns its status code"""
+    payload = {
+        "prompt": f"{PROMPT} #{index}",
+        "height": args.size,
+        "width": args.size,
+        "num_inference_steps": args.steps,
+    }
+
+    def send(session: requests.Session) -> int:
+        if endpoint == "file":
+            response = session.post(f"{base_url}/generate/file", json=payload, timeout=600)
+        elif endpoint == "url":
+            response = session.post(f"{base_url}/generate/url", json=payload, timeout=600)
+            if response.status_code == 200 and not response.json().get("success"):
+                return 500
+        else:
+            response = session.get(f"{base_url}/images/{image_filename}", timeout=60)
+        return response.status_code
+
+    return send
+
+
+def run_level(endpoint: str, concurrency: int, base_url: str, args: argparse.Namespace,
+              image_filename: Optional[str]) -> dict:
+    """Send requests from concurrency clients and collect latency statistics"""
+    count = args.image_requests if endpoint == "image" else args.requests
+    count = max(count, concurrency)
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index: int):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        send = make_request(endpoint, base_url, args, index, image_filename)
+        start = time.perf_counter()
+        try:
+            status = send(local.session)
+        except requests.RequestException:
+            status = 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            if status == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(count)))
+    wall = time.perf_counter() - start
+
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": errors,
+        "rps": len(latencies) / wall if wall > 0 else 0.0,
+        "rss_bytes": server_rss(base_url),
+    }
+    if latencies:
+        result.update({
+            "mean_s": statistics.mean(latencies),
+            "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95),
+            "p99_s": percentile(latencies, 99),
+        })
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> bool:
+    """Print changes against a baseline run and return True if nothing regressed"""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline}
+    ok = True
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%})")
+    print("=" * 66)
+    print(f"{'endpoint':<10}{'conc':>6}{'req/s':>12}{'change':>10}{'p95 s':>10}{'change':>10}{'':>8}")
+    print("-" * 66)
+    for result in results:
+        base = previous.get((result["endpoint"], result["concurrency"]))
+        if base is None or "p95_s" not in result or "p95_s" not in base:
+            continue
+        rps_change = result["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_change = result["p95_s"] / base["p95_s"] - 1 if base["p95_s"] else 0.0
+        regressed = rps_change < -tolerance or p95_change > tolerance
+        ok = ok and not regressed
+        print(f"{result['endpoint']:<10}{result['concurrency']:>6}{result['rps']:>12.2f}{rps_change:>+10.1%}"
+              f"{result['p95_s']:>10.3f}{p95_change:>+10.1%}{'  WORSE' if regressed else '':>8}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API throughput, latency and memory")
+    parser.add_argument("--url", type=str, help="Benchmark a running server instead of starting a simulated one")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the simulated server (default: 8765)")
+    parser.add_argument("--endpoints", type=str, default=",".join(ENDPOINTS),
+                        help="Comma-separated endpoints: file, url, image (default: all)")
+    parser.add_argument("--concurrency", type=str, default="1,2,4,8,16",
+                        help="Comma-separated concurrency levels (default: 1,2,4,8,16)")
+    parser.add_argument("--requests", type=int, default=32, help="Generation requests per level (default: 32)")
+    parser.add_argument("--image-requests", type=int, default=500, help="Image downloads per level (default: 500)")
+    parser.add_argument("--size", type=int, default=512, help="Image height and width (default: 512)")
+    parser.add_argument("--steps", type=int, default=9, help="Inference steps (default: 9)")
+    parser.add_argument("--step-ms", type=float, default=20, help="Simulated cost per step at 512x512 (default: 20)")
+    parser.add_argument("--decode-ms", type=float, default=40, help="Simulated VAE decode per image (default: 40)")
+    parser.add_argument("--text-encoder-ms", type=float, default=10,
+                        help="Simulated text encoding per prompt (default: 10)")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare against an earlier JSON result file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed relative drop in req/s or growth in p95 (default: 0.10)")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            parser.error(f"Unknown endpoint '{endpoint}', expected one of {', '.join(ENDPOINTS)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    server = None
+    workdir = tempfile.TemporaryDirectory(prefix="zimage-bench-")
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args, Path(workdir.name))
+
+    try:
+        image_filename = None
+        if "image" in endpoints:
+            response = requests.post(f"{base_url}/generate/url", json={"prompt": PROMPT, "height": args.size,
+                                                                        "width": args.size, "num_inference_steps": args.steps})
+            image_filename = response.json()["filename"]
+
+        backend = "external server" if args.url else f"simulated, {args.step_ms}ms/step"
+        print(f"Server: {base_url} ({backend}), {args.size}x{args.size}, {args.steps} steps")
+        print("=" * 78)
+        print(f"{'endpoint':<10}{'conc':>6}{'req/s':>10}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}"
+              f"{'errors':>8}{'RSS MB':>10}")
+        print("-" * 78)
+
+        results = []
+        for endpoint in endpoints:
+            for concurrency in levels:
+                result = run_level(endpoint, concurrency, base_url, args, image_filename)
+                results.append(result)
+                rss = f"{result['rss_bytes'] / 1024 / 1024:.0f}" if result["rss_bytes"] else "-"
+                if "p50_s" in result:
+                    print(f"{endpoint:<10}{concurrency:>6}{result['rps']:>10.2f}{result['p50_s']:>10.3f}"
+                          f"{result['p95_s']:>10.3f}{result['p99_s']:>10.3f}{result['errors']:>8}{rss:>10}")
+                else:
+                    print(f"{endpoint:<10}{concurrency:>6}{'all requests failed':>40}{result['errors']:>8}{rss:>10}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        workdir.cleanup()
+
+    output = {
+        "settings": {
+            "backend": "external" if args.url else "simulated",
+            "size": args.size,
+            "steps": args.steps,
+            "step_ms": args.step_ms,
+            "decode_ms": args.decode_ms,
+            "text_encoder_ms": args.text_encoder_ms,
+        },
+        "results": results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(output, indent=2))
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("settings") != output["settings"]:
+            print(f"\nWarning: baseline was recorded with different settings: {baseline.get('settings')}")
+        if not compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
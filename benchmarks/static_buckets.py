@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark static-shape bucket pipelines against the dynamic-shape pipeline
+
+Loads the model once, then for each resolution times generations on the
+dynamic pipeline and on a statically reshaped copy compiled for that shape.
+Compile time for the static copy is reported separately and excluded from
+the per-image timings.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from buckets import StaticBucketCache, parse_buckets
+from config import settings
+from model_manager import ModelManager
+
+PROMPT = "A lighthouse on a rocky coast at sunset, dramatic clouds, photorealistic"
+
+
+def time_runs(pipeline, height: int, width: int, steps: int, batch_size: int, repeat: int) -> list[float]:
+    timings = []
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        pipeline(
+            prompt=[PROMPT] * batch_size if batch_size > 1 else PROMPT,
+            height=height,
+            width=width,
+            num_inference_steps=steps,
+            guidance_scale=0.0,
+            generator=torch.Generator("cpu").manual_seed(i)
+        )
+        if i > 0:  # first run is warm-up
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark static-shape buckets against dynamic shapes")
+    parser.add_argument("--buckets", type=str, default="512x512,768x768,1024x1024",
+                        help="Comma-separated HEIGHTxWIDTH (default: 512x512,768x768,1024x1024)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Images per pipeline call (default: 1)")
+    parser.add_argument("--steps", type=int, default=settings.DEFAULT_STEPS, help="Inference steps")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (default: 3)")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    settings.INFERENCE_STREAMS = "1"
+    manager = ModelManager()
+    pipeline = manager.load_model()
+    static_buckets = StaticBucketCache(pipeline, streams=1, max_bytes=1 << 62)
+
+    print(f"Model: {settings.get_model_path()} on {settings.DEVICE}, {args.steps} steps, "
+          f"batch {args.batch_size}, {args.repeat} runs per case")
+    print("=" * 66)
+    print(f"{'bucket':<12}{'dynamic s':>12}{'static s':>12}{'speedup':>10}{'compile s':>12}")
+    print("-" * 66)
+
+    results = []
+    for height, width in parse_buckets(args.buckets):
+        dynamic = time_runs(pipeline, height, width, args.steps, args.batch_size, args.repeat)
+
+        start = time.perf_counter()
+        with static_buckets.acquire(height, width, args.batch_size) as static:
+            compile_seconds = time.perf_counter() - start
+            if static is None:
+                print(f"{height}x{width:<8}{'static reshape failed, see log':>46}")
+                continue
+            static_timings = time_runs(static, height, width, args.steps, args.batch_size, args.repeat)
+
+        result = {
+            "bucket": f"{height}x{width}",
+            "dynamic_s": statistics.median(dynamic),
+            "static_s": statistics.median(static_timings),
+            "compile_s": compile_seconds,
+        }
+        result["speedup"] = result["dynamic_s"] / result["static_s"]
+        results.append(result)
+        print(f"{result['bucket']:<12}{result['dynamic_s']:>12.2f}{result['static_s']:>12.2f}"
+              f"{result['speedup']:>10.2f}{result['compile_s']:>12.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
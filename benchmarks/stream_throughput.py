@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark generation throughput as the number of inference streams grows
+
+For each stream count the model is compiled with that many streams and the
+same number of threads generate images concurrently through the pipeline
+pool. Reports images per minute and mean latency per image.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch
+
+from config import settings
+from model_manager import ModelManager
+
+PROMPT = "A lighthouse on a rocky coast at sunset, dramatic clouds, photorealistic"
+
+
+def default_stream_counts() -> list[int]:
+    """Powers of two up to the core count, plus the core count itself"""
+    cores = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    counts.append(cores)
+    return counts
+
+
+def run(streams: int, images: int, height: int, width: int, steps: int) -> dict:
+    settings.INFERENCE_STREAMS = str(streams)
+    manager = ModelManager()
+    manager.load_model()
+    pool = manager.pool
+
+    def generate(seed: int) -> float:
+        start = time.perf_counter()
+        with pool.acquire() as pipeline:
+            pipeline(
+                prompt=PROMPT,
+                height=height,
+                width=width,
+                num_inference_steps=steps,
+                guidance_scale=0.0,
+                generator=torch.Generator("cpu").manual_seed(seed)
+            )
+        return time.perf_counter() - start
+
+    # Warm up every stream once
+    with ThreadPoolExecutor(max_workers=pool.size) as threads:
+        list(threads.map(generate, range(pool.size)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool.size) as threads:
+        latencies = list(threads.map(generate, range(images)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "streams": pool.size,
+        "images": images,
+        "seconds": elapsed,
+        "images_per_minute": images / elapsed * 60,
+        "mean_latency_s": statistics.mean(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput against the number of inference streams")
+    parser.add_argument("--streams", type=str, help="Comma-separated stream counts (default: 1, 2, 4, ... cores)")
+    parser.add_argument("--images", type=int, default=16, help="Images generated per stream count (default: 16)")
+    parser.add_argument("--height", type=int, default=512, help="Image height (default: 512)")
+    parser.add_argument("--width", type=int, default=512, help="Image width (default: 512)")
+    parser.add_argument("--steps", type=int, default=settings.DEFAULT_STEPS, help="Inference steps")
+    parser.add_argument("--json", type=Path, help="Write results to a JSON file")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.streams.split(",")] if args.streams else default_stream_counts()
+    print(f"Model: {settings.get_model_path()} on {settings.DEVICE}, {args.width}x{args.height}, "
+          f"{args.steps} steps, {args.images} images per run")
+    print("=" * 56)
+    print(f"{'streams':>8}{'seconds':>12}{'images/min':>14}{'latency s':>12}{'speedup':>10}")
+    print("-" * 56)
+
+    results = []
+    for count in counts:
+        result = run(count, args.images, args.height, args.width, args.steps)
+        result["speedup"] = result["images_per_minute"] / results[0]["images_per_minute"] if results else 1.0
+        results.append(result)
+        print(f"{result['streams']:>8}{result['seconds']:>12.1f}{result['images_per_minute']:>14.2f}"
+              f"{result['mean_latency_s']:>12.2f}{result['speedup']:>10.2f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Resolution buckets for Z-Image-Turbo
+
+Requests are mapped onto a fixed set of resolutions so that compatible work
+batches together and can run on statically shaped models, which are faster
+on CPU than the dynamic-shape pipeline. Static-shape copies of the pipeline
+are compiled lazily per (height, width, batch size) and kept in an LRU
+bounded by memory.
+"""
+import copy
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from config import settings
+from metrics import process_rss_bytes
+from pipeline_pool import PipelinePool, replicate, share_compiled
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BucketPolicyError(ValueError):
+    """Raised when a requested resolution cannot be served under the bucket policy"""
+
+
+def parse_buckets(value: str) -> list[tuple[int, int]]:
+    """Parse RESOLUTION_BUCKETS, a comma-separated list of HEIGHTxWIDTH"""
+    buckets = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        height, width = (int(part) for part in item.split("x"))
+        buckets.append((height, width))
+    return buckets
+
+
+def resolve_bucket(
+    height: int,
+    width: int,
+    buckets: list[tuple[int, int]],
+    policy: str
+) -> tuple[int, int, tuple[int, int]]:
+    """
+    Map a requested resolution onto a bucket
+
+    Args:
+        height: Requested image height
+        width: Requested image width
+        buckets: Available (height, width) buckets
+        policy: "snap" to the nearest bucket, "pad" to the smallest bucket
+            that contains the request and crop the result, or "strict"
+
+    Returns:
+        tuple: (output height, output width, bucket to run at)
+
+    Raises:
+        BucketPolicyError: If the policy cannot serve the resolution
+    """
+    if (height, width) in buckets:
+        return height, width, (height, width)
+
+    available = ", ".join(f"{h}x{w}" for h, w in buckets)
+    if policy == "strict":
+        raise BucketPolicyError(f"Resolution {height}x{width} is not supported, use one of: {available}")
+
+    if policy == "pad":
+        fitting = [bucket for bucket in buckets if bucket[0] >= height and bucket[1] >= width]
+        if not fitting:
+            raise BucketPolicyError(f"No resolution bucket can contain {height}x{width}, available: {available}")
+        bucket = min(fitting, key=lambda b: b[0] * b[1])
+        return height, width, bucket
+
+    # Nearest in log space, so 2x too large counts the same as 2x too small
+    bucket = min(buckets, key=lambda b: abs(math.log(b[0] / height)) + abs(math.log(b[1] / width)))
+    return bucket[0], bucket[1], bucket
+
+
+def _detached_part(part: Any) -> Any:
+    """Copy a model part with its own uncompiled ov.Model so it can be reshaped"""
+    clone = copy.copy(part)
+    clone.model = part.model.clone()
+    clone.request = None
+    return clone
+
+
+class _StaticEntry:
+    def __init__(self, pool: PipelinePool, size: int, build_seconds: float):
+        self.pool = pool
+        self.size = size
+        self.build_seconds = build_seconds
+        self.in_use = 0
+
+
+class StaticBucketCache:
+    """LRU of statically reshaped pipelines keyed by (height, width, batch size)"""
+
+    def __init__(self, pipeline: Any, streams: int = 1, max_bytes: Optional[int] = None):
+        self.pipeline = pipeline
+        self.streams = streams
+        self.max_bytes = max_bytes if max_bytes is not None else settings.BUCKET_CACHE_MAX_MB * 1024 * 1024
+
+        self._entries: OrderedDict[tuple, _StaticEntry] = OrderedDict()
+        self._failed: set[tuple] = set()
+        self._lock = threading.Lock()
+        self._build_locks: dict[tuple, threading.Lock] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def _build(self, key: tuple) -> _StaticEntry:
+        """Reshape and compile a static copy of the pipeline for one shape"""
+        height, width, batch_size = key
+        logger.info(f"Compiling static pipeline for {height}x{width}, batch {batch_size}...")
+        rss_before = process_rss_bytes()
+        start = time.perf_counter()
+
+        # Reshaping works in place, so every part gets its own copy of the ov.Model
+        static = replicate(self.pipeline, copy_part=_detached_part)
+        static.reshape(batch_size=batch_size, height=height, width=width, num_images_per_prompt=1)
+        # Prompt lengths vary, keep the dynamic text encoder (on its own infer request)
+        static.text_encoder = share_compiled(self.pipeline.text_encoder)
+        static.compile()
+
+        pool = PipelinePool.from_pipeline(static, self.streams)
+        build_seconds = time.perf_counter() - start
+        size = max(0, process_rss_bytes() - rss_before)
+        logger.info(f"Static pipeline {height}x{width}, batch {batch_size} ready in {build_seconds:.1f}s "
+                    f"(~{size / 1024 / 1024:.0f} MB)")
+        return _StaticEntry(pool, size, build_seconds)
+
+    def _get_entry(self, key: tuple) -> Optional[_StaticEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                entry.in_use += 1
+                return entry
+            if key in self._failed:
+                return None
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.in_use += 1
+                    return entry
+                if key in self._failed:
+                    return None
+            try:
+                entry = self._build(key)
+            except Exception as e:
+                logger.warning(f"Static reshape for {key} failed, using dynamic shapes: {e}")
+                with self._lock:
+                    self._failed.add(key)
+                return None
+
+            with self._lock:
+                self._entries[key] = entry
+                self._bytes += entry.size
+                self.builds += 1
+                entry.in_use += 1
+                self._evict()
+        return entry
+
+    def _evict(self):
+        """Drop least recently used idle entries while over the memory budget"""
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes or len(self._entries) <= 1:
+                break
+            entry = self._entries[key]
+            if entry.in_use:
+                continue
+            del self._entries[key]
+            self._bytes -= entry.size
+            self.evictions += 1
+            logger.info(f"Evicted static pipeline {key[0]}x{key[1]}, batch {key[2]}")
+
+    @contextmanager
+    def acquire(self, height: int, width: int, batch_size: int) -> Iterator[Optional[Any]]:
+        """
+        Borrow a static pipeline for one run, compiling it on first use
+
+        Yields None if the shape cannot be compiled statically; the caller
+        should then use the dynamic pipeline.
+        """
+        entry = self._get_entry((height, width, batch_size))
+        if entry is None:
+            yield None
+            return
+        try:
+            with entry.pool.acquire() as pipeline:
+                yield pipeline
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                self._evict()
+
+    def get_stats(self) -> dict:
+        """Get loaded static shapes, memory use and hit/build/eviction counters"""
+        with self._lock:
+            return {
+                "loaded": [f"{h}x{w}/b{b}" for h, w, b in self._entries],
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions,
+                "failed": [f"{h}x{w}/b{b}" for h, w, b in self._failed],
+            }
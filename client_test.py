@@ -4,8 +4,11 @@
 可以独立运行，测试API的各种功能
 """
 import argparse
+import asyncio
 import json
+import random
 import time
+from collections import Counter
 from pathlib import Path
 from typing import Optional
 
@@ -16,17 +19,33 @@ except ImportError:
     print("请运行: pip install requests")
     exit(1)
 
+# 压测模式使用异步连接池客户端，仅在 --load 时需要
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# trace 中会原样发送给 API 的字段
+REQUEST_FIELDS = (
+    "prompt", "height", "width", "num_inference_steps", "guidance_scale", "seed",
+    "format", "quality", "compress_level", "lossless", "model",
+)
+
 
 class ZImageClient:
     """Z-Image-Turbo API客户端"""
 
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", api_key: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
+        # 复用 keep-alive 连接
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["X-API-Key"] = api_key
 
     def health_check(self) -> bool:
         """检查服务器健康状态"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = self.session.get(f"{self.base_url}/health", timeout=5)
             response.raise_for_status()
             return True
         except Exception as e:
@@ -36,7 +55,7 @@ class ZImageClient:
     def get_info(self) -> Optional[dict]:
         """获取API信息"""
         try:
-            response = requests.get(f"{self.base_url}/", timeout=5)
+            response = self.session.get(f"{self.base_url}/", timeout=5)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -74,7 +93,7 @@ class ZImageClient:
                 print(f"  种子: {seed}")
 
             start_time = time.time()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/generate/file",
                 json=payload,
                 timeout=300  # 5分钟超时
@@ -139,7 +158,7 @@ class ZImageClient:
                 print(f"  种子: {seed}")
 
             start_time = time.time()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/generate/url",
                 json=payload,
                 timeout=300
@@ -168,7 +187,7 @@ class ZImageClient:
     def download_image_from_url(self, image_url: str, output_path: str) -> bool:
         """从URL下载图像"""
         try:
-            response = requests.get(image_url, timeout=30)
+            response = self.session.get(image_url, timeout=30)
             response.raise_for_status()
 
             output_file = Path(output_path)
@@ -182,6 +201,235 @@ class ZImageClient:
             return False
 
 
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """最近秩百分位数，空列表返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def load_trace(path: str) -> list[dict]:
+    """
+    读取 JSONL 格式的请求记录，每行一个请求
+
+    支持的字段: API 请求参数 (prompt、height、width 等)，endpoint (file 或
+    url，默认 file)，api_key (按记录使用不同的 API 密钥)，以及到达时间
+    offset (相对秒数) 或 timestamp (Unix 时间戳)。
+    没有 prompt 的记录 (例如 requests.jsonl) 使用 title 或 body 作为提示词。
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            payload = {key: record[key] for key in REQUEST_FIELDS if record.get(key) is not None}
+            payload.setdefault("prompt", record.get("title") or record.get("body") or f"trace request {line_number}")
+            item = {"endpoint": record.get("endpoint", "file"), "payload": payload}
+            if record.get("api_key"):
+                item["api_key"] = record["api_key"]
+            if "offset" in record:
+                item["at"] = float(record["offset"])
+            elif "timestamp" in record:
+                item["at"] = float(record["timestamp"])
+            items.append(item)
+
+    # 到达时间转换为相对第一条请求的秒数
+    times = [item["at"] for item in items if "at" in item]
+    if times and len(times) == len(items):
+        start = min(times)
+        for item in items:
+            item["at"] -= start
+    else:
+        for item in items:
+            item.pop("at", None)
+    return items
+
+
+def arrival_offsets(count: int, rate: float, arrival: str, rng: random.Random) -> list[float]:
+    """开环到达时间: constant 为等间隔，poisson 为指数分布间隔"""
+    offsets = []
+    at = 0.0
+    for _ in range(count):
+        offsets.append(at)
+        at += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+    return offsets
+
+
+class LoadTester:
+    """异步压测客户端: 固定并发 (闭环) 或按到达率/trace 时间发送 (开环)"""
+
+    def __init__(self, base_url: str, timeout: float = 600.0, max_connections: int = 256,
+                 api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.results: list[dict] = []
+
+    def _client(self) -> "httpx.AsyncClient":
+        # 连接池 + keep-alive，避免每个请求重新建立连接
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections)
+        )
+
+    async def _send(self, client: "httpx.AsyncClient", item: dict, scheduled: Optional[float] = None):
+        """发送一个请求，记录状态码、总延迟和首字节时间 (响应头到达)"""
+        start = time.perf_counter()
+        result = {"endpoint": item["endpoint"], "status": None, "latency": None, "ttfb": None, "lag": None,
+                  "degraded": False}
+        if scheduled is not None:
+            # 开环模式下实际发送时间晚于计划的秒数，过大说明压测机本身成为瓶颈
+            result["lag"] = start - scheduled
+        try:
+            api_key = item.get("api_key", self.api_key)
+            headers = {"X-API-Key": api_key} if api_key else None
+            async with client.stream("POST", f"/generate/{item['endpoint']}", json=item["payload"],
+                                     headers=headers) as response:
+                result["ttfb"] = time.perf_counter() - start
+                result["degraded"] = response.headers.get("x-degraded") == "true"
+                body = await response.aread()
+            result["status"] = response.status_code
+            if response.status_code == 200 and item["endpoint"] == "url" and not json.loads(body).get("success"):
+                result["status"] = 500
+        except httpx.TimeoutException:
+            result["status"] = "timeout"
+        except httpx.HTTPError as e:
+            result["status"] = type(e).__name__
+        result["latency"] = time.perf_counter() - start
+        self.results.append(result)
+
+    async def run_closed(self, items: list[dict], concurrency: int) -> float:
+        """固定并发: concurrency 个虚拟用户各自发完一个再发下一个，返回总耗时"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async with self._client() as client:
+            async def user():
+                while not queue.empty():
+                    await self._send(client, queue.get_nowait())
+
+            start = time.perf_counter()
+            await asyncio.gather(*[user() for _ in range(concurrency)])
+            return time.perf_counter() - start
+
+    async def run_open(self, items: list[dict], offsets: list[float]) -> float:
+        """开环: 按预定到达时间发送，不等待之前的请求完成，返回总耗时"""
+        async with self._client() as client:
+            start = time.perf_counter()
+            tasks = []
+            for item, offset in zip(items, offsets):
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._send(client, item, scheduled=start + offset)))
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - start
+
+    def report(self, wall: float) -> dict:
+        """汇总吞吐量、延迟百分位、首字节时间和错误率"""
+        ok = [r for r in self.results if r["status"] == 200]
+        latencies = [r["latency"] for r in ok]
+        ttfbs = [r["ttfb"] for r in ok if r["ttfb"] is not None]
+        lags = [r["lag"] for r in self.results if r["lag"] is not None]
+        total = len(self.results)
+        return {
+            "requests": total,
+            "succeeded": len(ok),
+            "degraded": sum(r["degraded"] for r in ok),
+            "error_rate": (total - len(ok)) / total if total else 0.0,
+            "status_counts": {str(k): v for k, v in Counter(r["status"] for r in self.results).items()},
+            "duration_s": wall,
+            "throughput_rps": len(ok) / wall if wall > 0 else 0.0,
+            "latency_s": {f"p{q}": percentile(latencies, q) for q in (50, 90, 95, 99)} | {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "max": max(latencies) if latencies else None,
+            },
+            "ttfb_s": {f"p{q}": percentile(ttfbs, q) for q in (50, 95, 99)},
+            "send_lag_s": {"p50": percentile(lags, 50), "max": max(lags) if lags else None} if lags else None,
+        }
+
+
+def print_load_report(report: dict):
+    """打印压测结果"""
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.3f}s" if value is not None else "-"
+
+    print("\n" + "=" * 60)
+    print("压测结果")
+    print("=" * 60)
+    print(f"  请求总数: {report['requests']}  成功: {report['succeeded']}  错误率: {report['error_rate']:.1%}")
+    print(f"  状态码分布: {report['status_counts']}")
+    if report["degraded"]:
+        print(f"  过载降级: {report['degraded']} 个成功请求以更少步数或较小分辨率生成")
+    print(f"  总耗时: {report['duration_s']:.2f}秒  吞吐量: {report['throughput_rps']:.2f} 请求/秒")
+    latency = report["latency_s"]
+    print(f"  延迟: 平均 {fmt(latency['mean'])}  p50 {fmt(latency['p50'])}  p90 {fmt(latency['p90'])}  "
+          f"p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}  最大 {fmt(latency['max'])}")
+    ttfb = report["ttfb_s"]
+    print(f"  首字节时间: p50 {fmt(ttfb['p50'])}  p95 {fmt(ttfb['p95'])}  p99 {fmt(ttfb['p99'])}")
+    if report["send_lag_s"]:
+        print(f"  发送延后: p50 {fmt(report['send_lag_s']['p50'])}  最大 {fmt(report['send_lag_s']['max'])}")
+
+
+def load_mode(args: argparse.Namespace) -> int:
+    """压测模式入口"""
+    if httpx is None:
+        print("错误: 压测模式需要安装 httpx 库")
+        print("请运行: pip install httpx")
+        return 1
+
+    rng = random.Random(args.random_seed)
+    if args.trace:
+        items = load_trace(args.trace)
+        if args.requests:
+            items = items[:args.requests]
+        print(f"回放 trace: {args.trace} ({len(items)} 个请求)")
+    else:
+        payload = {
+            "prompt": args.prompt or "A beautiful sunset over mountains",
+            "height": args.height,
+            "width": args.width,
+            "num_inference_steps": args.steps,
+            "guidance_scale": args.guidance_scale,
+        }
+        if args.seed is not None:
+            payload["seed"] = args.seed
+        if args.allow_degraded:
+            payload["allow_degraded"] = True
+        items = [{"endpoint": args.method, "payload": dict(payload)} for _ in range(args.requests or 100)]
+    if not items:
+        print("没有可发送的请求")
+        return 1
+
+    tester = LoadTester(args.url, timeout=args.timeout, api_key=args.api_key)
+    if args.rate:
+        offsets = arrival_offsets(len(items), args.rate, args.arrival, rng)
+        print(f"开环模式: {args.arrival} 到达，{args.rate} 请求/秒，共 {len(items)} 个请求")
+        wall = asyncio.run(tester.run_open(items, offsets))
+    elif args.concurrency is None and all("at" in item for item in items):
+        offsets = [item["at"] / args.speedup for item in items]
+        print(f"按 trace 时间回放 ({args.speedup}x 速度)，共 {len(items)} 个请求")
+        wall = asyncio.run(tester.run_open(items, offsets))
+    else:
+        concurrency = args.concurrency or 4
+        print(f"闭环模式: 并发 {concurrency}，共 {len(items)} 个请求")
+        wall = asyncio.run(tester.run_closed(items, concurrency))
+
+    report = tester.report(wall)
+    print_load_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\n结果已写入: {args.json}")
+    return 0 if report["succeeded"] else 1
+
+
 def interactive_mode(client: ZImageClient):
     """交互式模式"""
     print("\n" + "=" * 60)
@@ -260,6 +508,15 @@ def main():
 
   # 指定API地址
   python client_test.py --url http://192.168.1.100:8000 --check
+
+  # 压测: 固定 8 并发发送 200 个请求
+  python client_test.py --load --concurrency 8 --requests 200
+
+  # 压测: 泊松到达，平均每秒 2 个请求
+  python client_test.py --load --rate 2 --arrival poisson --requests 300 --json report.json
+
+  # 回放 JSONL 请求记录 (有 offset/timestamp 时按原始时间，2 倍速)
+  python client_test.py --load --trace traffic.jsonl --speedup 2
         """
     )
 
@@ -269,6 +526,12 @@ def main():
         help="API服务器地址 (默认: http://localhost:8000)"
     )
 
+    parser.add_argument(
+        "--api-key",
+        type=str,
+        help="API 密钥，以 X-API-Key 请求头发送"
+    )
+
     parser.add_argument(
         "--check",
         action="store_true",
@@ -341,10 +604,28 @@ def main():
         help="生成方法: file=直接返回文件, url=返回URL (默认: file)"
     )
 
+    load = parser.add_argument_group("压测模式")
+    load.add_argument("--load", action="store_true", help="异步压测模式")
+    load.add_argument("--concurrency", type=int, help="闭环模式的并发数 (默认: 4)")
+    load.add_argument("--rate", type=float, help="开环模式的到达率 (请求/秒)")
+    load.add_argument("--arrival", choices=["poisson", "constant"], default="poisson",
+                      help="开环到达分布 (默认: poisson)")
+    load.add_argument("--requests", type=int, help="请求总数 (默认: 100，trace 模式默认全部)")
+    load.add_argument("--trace", type=str, help="回放 JSONL 请求记录")
+    load.add_argument("--speedup", type=float, default=1.0, help="按 trace 时间回放时的加速倍数 (默认: 1)")
+    load.add_argument("--allow-degraded", action="store_true",
+                      help="请求允许过载时降级 (更少步数或较小分辨率放大)")
+    load.add_argument("--timeout", type=float, default=600.0, help="单个请求超时秒数 (默认: 600)")
+    load.add_argument("--random-seed", type=int, default=0, help="泊松到达的随机种子 (默认: 0)")
+    load.add_argument("--json", type=str, help="将压测结果写入 JSON 文件")
+
     args = parser.parse_args()
 
+    if args.load:
+        return load_mode(args)
+
     # 创建客户端
-    client = ZImageClient(args.url)
+    client = ZImageClient(args.url, api_key=args.api_key)
 
     print("=" * 60)
     print("Z-Image-Turbo API 测试客户端")
@@ -4,6 +4,8 @@ Configuration module for Z-Image-Turbo API
 import sys
 import os
 from pathlib import Path
+from typing import Literal, Optional
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -24,6 +26,31 @@ class Settings(BaseSettings):
     MODEL_PATH: str = "models/Z-Image-Turbo/INT4"  # Path to OpenVINO model
     DEVICE: str = "CPU"  # Options: CPU, GPU, AUTO
 
+    # Model variants, JSON object of name -> model path (empty serves MODEL_PATH only)
+    MODEL_VARIANTS: dict[str, str] = {}
+    DEFAULT_MODEL: str = ""  # Variant used when a request names none (default: first variant)
+    MODEL_MEMORY_BUDGET_MB: int = 0  # Weights kept loaded at once, least recently used unloaded first (0 = unlimited)
+    SHARE_TEXT_ENCODER: bool = True  # Load identical text encoders once across variants
+    # Pipeline backend; "simulated" sleeps instead of running the model, for benchmarking the serving layer
+    PIPELINE_BACKEND: Literal["openvino", "simulated"] = "openvino"
+    SIMULATED_STEP_MS: float = 50  # Simulated denoising step at 512x512, batch 1
+    SIMULATED_TEXT_ENCODER_MS: float = 20  # Simulated text encoding per prompt
+    SIMULATED_DECODE_MS: float = 100  # Simulated VAE decode at 512x512, per image
+    MODEL_CACHE_ENABLED: bool = True  # Reuse compiled models across restarts
+    MODEL_CACHE_DIR: str = "model_cache"  # Relative to project root
+
+    # OpenVINO compile options (unset values keep the device defaults)
+    OV_PERFORMANCE_HINT: Optional[Literal["LATENCY", "THROUGHPUT", "CUMULATIVE_THROUGHPUT"]] = None
+    OV_NUM_STREAMS: Optional[str] = None  # Streams per compiled model, a number or AUTO
+    OV_INFERENCE_NUM_THREADS: Optional[int] = None  # CPU threads per compiled model
+    OV_INFERENCE_PRECISION_HINT: Optional[Literal["f32", "bf16", "f16"]] = None
+    OV_ENABLE_CPU_PINNING: Optional[bool] = None
+    OV_ENABLE_HYPER_THREADING: Optional[bool] = None
+    # Per-component overrides, JSON objects of OpenVINO properties
+    OV_TEXT_ENCODER_CONFIG: dict[str, str] = {}
+    OV_TRANSFORMER_CONFIG: dict[str, str] = {}
+    OV_VAE_DECODER_CONFIG: dict[str, str] = {}
+
     # API settings
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
@@ -31,6 +58,16 @@ class Settings(BaseSettings):
     # Image storage
     OUTPUT_DIR: str = "generated_images"  # Relative to project root
     MAX_STORED_IMAGES: int = 1000
+    MAX_STORED_MB: int = 0  # Total size limit for stored images (0 = unlimited)
+    MAX_IMAGE_AGE_HOURS: float = 0  # Delete images older than this (0 = keep until other limits apply)
+    PERSIST_FILE_OUTPUTS: bool = True  # Also save /generate/file results (in the background)
+
+    # Output encoding
+    OUTPUT_FORMAT: Literal["png", "jpeg", "webp"] = "png"
+    PNG_COMPRESS_LEVEL: int = Field(6, ge=0, le=9)  # 0 (fastest) to 9 (smallest)
+    JPEG_QUALITY: int = Field(90, ge=1, le=100)
+    WEBP_QUALITY: int = Field(90, ge=1, le=100)
+    WEBP_LOSSLESS: bool = False
 
     # Generation defaults
     DEFAULT_HEIGHT: int = 512
@@ -38,6 +75,63 @@ class Settings(BaseSettings):
     DEFAULT_STEPS: int = 9
     DEFAULT_GUIDANCE_SCALE: float = 0.0
 
+    # Resolution buckets (empty accepts any size with dynamic shapes)
+    RESOLUTION_BUCKETS: str = ""  # Comma-separated HEIGHTxWIDTH, e.g. "512x512,768x768,1024x1024"
+    RESOLUTION_POLICY: Literal["snap", "pad", "strict"] = "snap"  # For sizes that are not a bucket
+    STATIC_BUCKETS: bool = True  # Compile static-shape models per bucket
+    BUCKET_CACHE_MAX_MB: int = 4096  # Memory budget for compiled static-shape models
+
+    # Startup warm-up
+    WARMUP_ENABLED: bool = True
+    WARMUP_SHAPES: str = ""  # Comma-separated HEIGHTxWIDTH[xSTEPS], empty for the defaults
+
+    # Inference executor
+    INFERENCE_WORKERS: int = 1  # Concurrent pipeline calls, raised to INFERENCE_STREAMS if lower
+    INFERENCE_STREAMS: str = "1"  # Parallel infer requests on the shared compiled model, or "auto"
+    INFERENCE_QUEUE_SIZE: int = 8  # Requests allowed to wait for a free worker
+    INFERENCE_RETRY_AFTER: int = 10  # Retry-After seconds when no timing data is available yet
+    DISCONNECT_POLL_INTERVAL: float = 0.5  # Seconds between client disconnect checks while generating
+
+    # API keys and fair scheduling
+    API_KEYS_FILE: str = ""  # JSON file with priority classes and per-key limits, relative to project root
+    REQUIRE_API_KEY: bool = False  # Reject generation requests without a known X-API-Key
+
+    # Scheduling within a priority class
+    SCHEDULER_POLICY: Literal["fifo", "sjf", "edf"] = "fifo"  # Arrival order, shortest job first or earliest deadline
+    SCHEDULER_AGING: float = 0.5  # sjf: seconds of estimated runtime forgiven per second waited
+    SCHEDULER_DEFAULT_DEADLINE: float = 300  # edf: deadline in seconds for requests without X-Deadline
+
+    # Admission control
+    ADMISSION_LATENCY_BUDGET: float = 120  # Reject requests estimated to finish later than this many seconds (0 disables)
+    COST_PRIOR_STEP_SECONDS: float = 1.0  # Assumed seconds per 512x512 step until runs have been measured
+
+    # Quality degradation under overload, for requests that opt in with allow_degraded
+    DEGRADE_WAIT_SECONDS: float = 30  # Estimated wait at which degradation starts, it deepens as the wait grows (0 disables)
+    DEGRADE_MIN_STEPS: int = 4  # Fewest denoising steps a degraded request is run with
+    DEGRADE_RESOLUTION: bool = True  # Once at the step floor, render smaller and upscale to the requested size
+    DEGRADE_MIN_SIZE: int = 512  # Smallest side a degraded request is rendered at
+
+    # Request batching
+    BATCH_MAX_SIZE: int = 4  # Max compatible requests per pipeline call (1 disables batching)
+    BATCH_MAX_WAIT_MS: int = 50  # How long the first request waits for others to join its batch
+    BATCH_REQUEST_MAX_ITEMS: int = 1000  # Max items in one /generate/batch call
+    MAX_IMAGES_PER_REQUEST: int = 16  # Max num_images / seeds per request, generated as one pipeline batch
+
+    # Prompt embedding cache
+    PROMPT_CACHE_MAX_MB: int = 256  # Memory budget for cached text encoder outputs (0 disables)
+
+    # Result cache for seeded generations
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_DIR: str = "result_cache"  # Relative to project root
+    RESULT_CACHE_MEMORY_MB: int = 128
+    RESULT_CACHE_DISK_MB: int = 1024  # 0 keeps results in memory only
+
+    # Asynchronous job queue
+    JOBS_DB: str = "jobs.db"  # SQLite file relative to project root
+    JOBS_MAX_ACTIVE: int = 4  # Queued jobs handed to the pipeline at once
+    JOBS_MAX_QUEUED: int = 1000  # 0 for unlimited
+    JOBS_RETENTION_HOURS: int = 24  # Finished jobs are forgotten after this (0 keeps them)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -57,6 +151,28 @@ class Settings(BaseSettings):
             return model_path
         return PROJECT_ROOT / self.MODEL_PATH
 
+    def get_model_variants(self) -> dict[str, Path]:
+        """Get absolute paths of the configured model variants by name"""
+        if not self.MODEL_VARIANTS:
+            model_path = self.get_model_path()
+            return {model_path.name.lower(): model_path}
+
+        return {name: self._resolve_variant_path(path) for name, path in self.MODEL_VARIANTS.items()}
+
+    @staticmethod
+    def _resolve_variant_path(path: str) -> Path:
+        """Absolute path of a variant; relative paths are under ZIMAGE_RESOURCE_DIR when it is set"""
+        model_path = Path(path)
+        if model_path.is_absolute():
+            return model_path
+        resource_dir = os.environ.get("ZIMAGE_RESOURCE_DIR")
+        if resource_dir:
+            # The resource directory stands in for models/, as in get_model_path
+            if model_path.parts and model_path.parts[0] == "models":
+                model_path = Path(*model_path.parts[1:])
+            return Path(resource_dir) / model_path
+        return PROJECT_ROOT / model_path
+
     def get_output_dir(self) -> Path:
         """Get absolute path to output directory"""
         return PROJECT_ROOT / self.OUTPUT_DIR
@@ -0,0 +1,149 @@
+"""
+Graceful quality degradation under overload for Z-Image-Turbo
+
+When the estimated wait for the inference workers passes
+DEGRADE_WAIT_SECONDS, requests that opt in with allow_degraded are made
+cheaper instead of queueing behind the backlog: first their denoising steps
+are lowered toward DEGRADE_MIN_STEPS, then, once at that floor, they are
+rendered at a smaller size (a smaller resolution bucket if buckets are
+configured) and upscaled to the requested size. The deeper the overload,
+the larger the cut: at twice the threshold a request runs at about half its
+cost. Turbo models still give acceptable images at 4-6 steps.
+"""
+import dataclasses
+import logging
+import math
+import threading
+from typing import Optional
+
+from config import settings
+from generator import GenerationJob, get_generator
+from metrics import get_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Degrader:
+    """Lowers the steps and render size of opted-in jobs while the server is overloaded"""
+
+    def __init__(
+        self,
+        wait_threshold: Optional[float] = None,
+        min_steps: Optional[int] = None,
+        resolution: Optional[bool] = None,
+        min_size: Optional[int] = None,
+        buckets: Optional[list[tuple[int, int]]] = None
+    ):
+        self.wait_threshold = wait_threshold if wait_threshold is not None else settings.DEGRADE_WAIT_SECONDS
+        self.min_steps = max(1, min_steps or settings.DEGRADE_MIN_STEPS)
+        self.resolution = resolution if resolution is not None else settings.DEGRADE_RESOLUTION
+        self.min_size = min_size or settings.DEGRADE_MIN_SIZE
+        self.buckets = buckets or []
+
+        self._lock = threading.Lock()
+        self.considered = 0
+        self.degraded = 0
+        self.steps_reduced = 0
+        self.resolution_reduced = 0
+        self._metrics = get_metrics()
+
+    def degrade(self, jobs: list[GenerationJob], wait: float) -> list[GenerationJob]:
+        """
+        Cheaper copies of jobs for the current estimated wait
+
+        Jobs are returned unchanged below the threshold. All jobs of one
+        request share their parameters, so they are degraded alike.
+
+        Args:
+            jobs: Jobs of one request that opted in to degradation
+            wait: Estimated seconds until the inference workers are free
+        """
+        with self._lock:
+            self.considered += 1
+        if self.wait_threshold <= 0 or wait <= self.wait_threshold:
+            return jobs
+
+        # Share of the request's cost to keep, so degraded work drains as fast as it arrives
+        keep = self.wait_threshold / wait
+        job = jobs[0]
+        floor = min(self.min_steps, job.num_inference_steps)
+        steps = max(floor, math.ceil(job.num_inference_steps * keep))
+        render_size = job.run_size
+        if self.resolution and steps == floor:
+            # The part of the cut the step floor could not deliver comes from the resolution
+            render_size = self._smaller_size(*job.run_size, keep * job.num_inference_steps / steps)
+
+        if steps == job.num_inference_steps and render_size == job.run_size:
+            return jobs
+
+        changes = []
+        if steps != job.num_inference_steps:
+            changes.append("steps")
+        if render_size != job.run_size:
+            changes.append("resolution")
+        with self._lock:
+            self.degraded += 1
+            self.steps_reduced += "steps" in changes
+            self.resolution_reduced += "resolution" in changes
+        for change in changes:
+            self._metrics.degraded.inc(change=change)
+        logger.info(f"Degrading request under overload (estimated wait {wait:.0f}s): "
+                    f"{job.num_inference_steps} -> {steps} steps, "
+                    f"{job.run_size[0]}x{job.run_size[1]} -> {render_size[0]}x{render_size[1]}")
+
+        bucket = render_size if render_size != job.run_size else job.bucket
+        return [dataclasses.replace(j, num_inference_steps=steps, bucket=bucket) for j in jobs]
+
+    def _smaller_size(self, height: int, width: int, keep: float) -> tuple[int, int]:
+        """A render size of about keep times the area, no side below DEGRADE_MIN_SIZE"""
+        if keep >= 1:
+            return height, width
+        target = height * width * keep
+        min_height, min_width = min(height, self.min_size), min(width, self.min_size)
+
+        if self.buckets:
+            # Smaller buckets of about the same aspect ratio, so upscaling does not distort
+            aspect = math.log(height / width)
+            candidates = [
+                (h, w) for h, w in self.buckets
+                if min_height <= h <= height and min_width <= w <= width and h * w < height * width
+                and abs(math.log(h / w) - aspect) < 0.1
+            ]
+            if not candidates:
+                return height, width
+            fitting = [b for b in candidates if b[0] * b[1] <= target]
+            if fitting:
+                return max(fitting, key=lambda b: b[0] * b[1])
+            return min(candidates, key=lambda b: b[0] * b[1])
+
+        # Without buckets, scale both sides alike, in the multiples of 64 the pipeline needs
+        scale = math.sqrt(keep)
+        size = (max(min_height, int(height * scale) // 64 * 64), max(min_width, int(width * scale) // 64 * 64))
+        return size if size[0] * size[1] < height * width else (height, width)
+
+    def get_stats(self) -> dict:
+        """Get the degradation settings and how many requests were degraded"""
+        with self._lock:
+            return {
+                "wait_threshold_seconds": self.wait_threshold,
+                "min_steps": self.min_steps,
+                "resolution": self.resolution,
+                "min_size": self.min_size,
+                "considered": self.considered,
+                "degraded": self.degraded,
+                "steps_reduced": self.steps_reduced,
+                "resolution_reduced": self.resolution_reduced,
+            }
+
+
+# Global degrader instance
+_degrader: Optional[Degrader] = None
+
+
+def get_degrader() -> Degrader:
+    """Get or create global degrader instance"""
+    global _degrader
+    if _degrader is None:
+        _degrader = Degrader(buckets=get_generator().buckets)
+    return _degrader
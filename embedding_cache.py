@@ -0,0 +1,128 @@
+"""
+Prompt embedding cache for Z-Image-Turbo
+
+Keeps text encoder outputs in a memory-bounded LRU so repeated prompts
+(templates, retries, seed sweeps) skip text encoding entirely.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate memory footprint of a tensor or array in bytes"""
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return value.element_size() * value.nelement()
+    return int(getattr(value, "nbytes", 0))
+
+
+class PromptEmbeddingCache:
+    """LRU cache of prompt embeddings keyed by model identity and prompt text"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.PROMPT_CACHE_MAX_MB * 1024 * 1024
+
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_or_encode(
+        self,
+        model_id: str,
+        prompts: list[str],
+        encode: Callable[[list[str]], list[Any]]
+    ) -> list[Any]:
+        """
+        Look up embeddings for a list of prompts, encoding only the missing ones
+
+        Args:
+            model_id: Identity of the model that produced the embeddings
+            prompts: Prompt texts, duplicates allowed
+            encode: Encodes a list of unique prompts into one embedding each
+
+        Returns:
+            list: One embedding per prompt, in order
+        """
+        found: dict[str, Any] = {}
+        with self._lock:
+            for prompt in dict.fromkeys(prompts):
+                entry = self._entries.get((model_id, prompt))
+                if entry is not None:
+                    self._entries.move_to_end((model_id, prompt))
+                    found[prompt] = entry[0]
+
+            # Duplicates within one call are encoded once, so only unique misses count
+            missing = [prompt for prompt in dict.fromkeys(prompts) if prompt not in found]
+            self.misses += len(missing)
+            self.hits += len(prompts) - len(missing)
+
+        if missing:
+            embeddings = encode(missing)
+            for prompt, embedding in zip(missing, embeddings):
+                found[prompt] = embedding
+                self._put((model_id, prompt), embedding)
+
+        return [found[prompt] for prompt in prompts]
+
+    def _put(self, key: tuple[str, str], embedding: Any):
+        size = _sizeof(embedding)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (embedding, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached embeddings"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """Get cache size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global embedding cache instance
+_embedding_cache: Optional[PromptEmbeddingCache] = None
+
+
+def get_embedding_cache() -> PromptEmbeddingCache:
+    """Get or create global prompt embedding cache instance"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = PromptEmbeddingCache()
+    return _embedding_cache
@@ -0,0 +1,255 @@
+"""
+Bounded inference executor for Z-Image-Turbo
+
+Blocking pipeline calls run on dedicated worker threads so the asyncio
+event loop keeps serving other requests while a diffusion run is in progress.
+Waiting tasks are ordered by a weighted fair queue across priority classes,
+and tasks that could no longer finish before their deadline are dropped.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from api_keys import get_client_registry
+from config import settings
+from metrics import get_metrics
+from scheduler import DeadlineExceededError, FairQueue, misses_deadline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot accept more work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceTask:
+    """A unit of work waiting for, or running on, an inference worker"""
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict,
+                 loop: asyncio.AbstractEventLoop, future: asyncio.Future,
+                 priority: Optional[str] = None, cost: float = 1.0,
+                 deadline: Optional[float] = None, expires: Optional[float] = None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.loop = loop
+        self.future = future
+        self.priority = priority
+        self.cost = cost  # Estimated seconds, the task's charge against its class share
+        self.deadline = deadline  # time.monotonic() the task is due, for earliest-deadline-first
+        self.expires = expires  # time.monotonic() after which nobody wants the result
+        self.finish_tag = 0.0  # Set by the fair queue
+        self.virtual_arrival = 0.0
+        self.enqueued_at = time.monotonic()
+
+    def set_result(self, result: Any):
+        self._call_in_loop(result, None)
+
+    def set_exception(self, exc: BaseException):
+        self._call_in_loop(None, exc)
+
+    def _call_in_loop(self, result: Any, exc: Optional[BaseException]):
+        try:
+            self.loop.call_soon_threadsafe(self._resolve, result, exc)
+        except RuntimeError:
+            # Event loop already closed, nobody is waiting for the result
+            pass
+
+    def _resolve(self, result: Any, exc: Optional[BaseException]):
+        if self.future.done():
+            return
+        if exc is not None:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(result)
+
+
+class InferenceExecutor:
+    """Runs pipeline calls on a fixed pool of worker threads with a bounded queue"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue_size: Optional[int] = None):
+        self.max_workers = max(1, max_workers or settings.INFERENCE_WORKERS)
+        self.max_queue_size = max(0, max_queue_size if max_queue_size is not None
+                                  else settings.INFERENCE_QUEUE_SIZE)
+
+        registry = get_client_registry()
+        self._queue = FairQueue(registry.classes, registry.default_priority)
+        self._cond = threading.Condition()
+        self._running = 0
+        self._shutdown = False
+
+        # Exponentially weighted average task duration, used for Retry-After
+        self._avg_duration: Optional[float] = None
+        self._completed = 0
+        self._rejected = 0
+        self._dropped = 0
+        self._expired = 0
+        self._metrics = get_metrics()
+
+        self._workers = []
+        self._start_workers(self.max_workers)
+
+        logger.info(f"Inference executor started with {self.max_workers} worker(s), "
+                    f"queue size {self.max_queue_size}, {self._queue.policy} scheduling")
+
+    def _start_workers(self, count: int):
+        for _ in range(count):
+            worker = threading.Thread(target=self._worker_loop, name=f"inference-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def ensure_workers(self, count: int):
+        """Grow the worker pool so that at least count tasks can run at once"""
+        with self._cond:
+            extra = count - self.max_workers
+            if extra <= 0:
+                return
+            self.max_workers = count
+            self._start_workers(extra)
+        logger.info(f"Inference executor grown to {count} worker(s)")
+
+    def submit(self, fn: Callable, *args, priority: Optional[str] = None, cost: float = 1.0,
+               deadline: Optional[float] = None, expires: Optional[float] = None, **kwargs) -> asyncio.Future:
+        """
+        Queue a blocking callable for an inference worker
+
+        Must be called from the event loop. Cancelling the returned future
+        drops the task if no worker has picked it up yet.
+
+        Args:
+            fn: Blocking callable, called with args and kwargs
+            priority: Priority class to queue the task in (default class if None)
+            cost: Estimated seconds the task will run, charged to its class
+            deadline: time.monotonic() the task is due (earliest-deadline-first order)
+            expires: time.monotonic() after which the task is dropped instead
+                of run, if it could not finish by then
+
+        Raises:
+            QueueFullError: If all workers are busy and the task's class has
+                filled its share of the queue
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        task = InferenceTask(fn, args, kwargs, loop, future, priority, cost, deadline, expires)
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Inference executor is shut down")
+            # Each class gets the full queue size, so bulk work cannot lock interactive callers out
+            queued = self._queue.length(self._queue.priority_of(task))
+            if queued + self._running >= self.max_workers + self.max_queue_size:
+                self._rejected += 1
+                raise QueueFullError(self._estimate_retry_after())
+            self._queue.push(task)
+            self._cond.notify()
+
+        future.add_done_callback(lambda f: self._discard(task) if f.cancelled() else None)
+        return future
+
+    async def run(self, fn: Callable, *args, priority: Optional[str] = None, cost: float = 1.0,
+                  deadline: Optional[float] = None, expires: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking callable on an inference worker and await its result
+
+        Raises:
+            QueueFullError: If all workers are busy and the queue is full
+        """
+        return await self.submit(fn, *args, priority=priority, cost=cost, deadline=deadline, expires=expires,
+                                 **kwargs)
+
+    def _discard(self, task: InferenceTask):
+        """Remove a cancelled task from the queue if it has not started"""
+        with self._cond:
+            if self._queue.remove(task):
+                self._dropped += 1
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                task = self._queue.pop()
+                if task.future.cancelled():
+                    # Cancelled between queueing and now; nobody wants the result
+                    self._dropped += 1
+                    continue
+                if misses_deadline(task, time.monotonic()):
+                    # Running it would only produce an image nobody is waiting for
+                    self._expired += 1
+                    self._metrics.deadline_missed.inc(stage="queue")
+                    task.set_exception(DeadlineExceededError())
+                    continue
+                self._running += 1
+
+            start = time.monotonic()
+            self._metrics.queue_wait.observe(start - task.enqueued_at, priority=self._queue.priority_of(task))
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.set_exception(e)
+            else:
+                task.set_result(result)
+            finally:
+                duration = time.monotonic() - start
+                with self._cond:
+                    self._running -= 1
+                    self._completed += 1
+                    if self._avg_duration is None:
+                        self._avg_duration = duration
+                    else:
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    def _estimate_retry_after(self) -> int:
+        """Estimate seconds until a queue slot frees up"""
+        if self._avg_duration is None:
+            return settings.INFERENCE_RETRY_AFTER
+        backlog = (len(self._queue) + self._running) / self.max_workers
+        return max(1, math.ceil(self._avg_duration * backlog))
+
+    def get_stats(self) -> dict:
+        """Get current queue and worker statistics"""
+        with self._cond:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": len(self._queue),
+                "max_queue_size": self.max_queue_size,
+                "classes": self._queue.get_stats(),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "dropped": self._dropped,
+                "expired": self._expired,
+                "policy": self._queue.policy,
+                "avg_task_seconds": self._avg_duration,
+            }
+
+    def shutdown(self):
+        """Stop the worker threads after their current task"""
+        with self._cond:
+            self._shutdown = True
+            pending = self._queue.drain()
+            self._cond.notify_all()
+        for task in pending:
+            task.set_exception(RuntimeError("Inference executor is shut down"))
+
+
+# Global executor instance
+_executor: Optional[InferenceExecutor] = None
+
+
+def get_executor() -> InferenceExecutor:
+    """Get or create global inference executor instance"""
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor()
+    return _executor
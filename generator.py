@@ -2,20 +2,91 @@
 Image generation service for Z-Image-Turbo
 """
 import logging
+import random
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterator, Optional
 
 import torch
 from PIL import Image
 
+from admission import get_cost_model, work_units
+from buckets import parse_buckets, resolve_bucket
 from config import settings
-from model_manager import get_model_manager
+from embedding_cache import get_embedding_cache
+from imaging import EncodeOptions, encode_image, fit_to_size, resolve_encode_options
+from metrics import get_metrics
+from model_manager import ModelManager, get_model_registry
+from storage import get_image_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Called after every denoising step with (step, total steps, latents)
+StepCallback = Callable[[int, int, Any], None]
+
+
+class GenerationCancelled(Exception):
+    """Raised inside the pipeline when every job of a run has been cancelled"""
+
+    def __init__(self, step: int, total: int):
+        super().__init__(f"Generation cancelled at step {step}/{total}")
+        self.step = step
+        self.total = total
+
+
+@dataclass
+class GenerationJob:
+    """Fully resolved parameters for a single image generation"""
+    prompt: str
+    height: int
+    width: int
+    num_inference_steps: int
+    guidance_scale: float
+    seed: Optional[int] = None
+    encode: EncodeOptions = field(default_factory=EncodeOptions)
+    bucket: Optional[tuple[int, int]] = None  # (height, width) the pipeline runs at, if bucketed or degraded
+    model: Optional[str] = None  # Model variant name, the default variant if None
+    priority: Optional[str] = None  # Scheduling class of the caller, the default class if None
+    client: Optional[str] = None  # Name of the caller's API key, None for anonymous callers
+    deadline: Optional[float] = None  # time.monotonic() by which the client needs the image
+    _cancelled: threading.Event = field(default_factory=threading.Event, init=False, repr=False, compare=False)
+
+    @property
+    def run_size(self) -> tuple[int, int]:
+        """(height, width) of the pipeline run; larger than the output when padded, smaller when degraded"""
+        return self.bucket or (self.height, self.width)
+
+    @property
+    def batch_key(self) -> tuple:
+        """Jobs with equal keys can share one pipeline call"""
+        return (self.model, *self.run_size, self.num_inference_steps, self.guidance_scale)
+
+    @property
+    def work_units(self) -> float:
+        """Cost of this job's share of a pipeline run, in 512x512 denoising steps"""
+        return work_units(*self.run_size, self.num_inference_steps, guidance_scale=self.guidance_scale)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Signal that nobody is waiting for this job's image any more"""
+        self._cancelled.set()
+
+
+@dataclass
+class GeneratedImage:
+    """A generated image together with its encoded bytes"""
+    image: Image.Image
+    data: bytes
+
 
 class ImageGenerator:
     """Handles text-to-image generation"""
@@ -23,16 +94,70 @@ class ImageGenerator:
     def __init__(self):
         self.output_dir = settings.get_output_dir()
         self.output_dir.mkdir(exist_ok=True)
-        self.model_manager = get_model_manager()
-        self.pipeline = None
+        self.registry = get_model_registry()
+        self.embedding_cache = get_embedding_cache()
+        self.store = get_image_store()
+        self.metrics = get_metrics()
+        self.cost_model = get_cost_model()
+        self.buckets = parse_buckets(settings.RESOLUTION_BUCKETS)
+
+        self._stats_lock = threading.Lock()
+        self._aborted_runs = 0
+        self._skipped_steps = 0
+        # (pipeline, height, width, batch size) that have run once; first runs include compile time
+        self._warm_shapes: set[tuple[int, int, int, int]] = set()
 
     def initialize(self):
-        """Initialize the generator by loading the model"""
-        if self.pipeline is None:
+        """Initialize the generator by loading the default model; other variants load on first use"""
+        if self.registry.get().pipeline is None:
             logger.info("Initializing image generator...")
-            self.pipeline = self.model_manager.initialize()
+            self.registry.load()
             logger.info("Image generator initialized")
 
+    def resolve_job(
+        self,
+        prompt: str,
+        height: Optional[int] = None,
+        width: Optional[int] = None,
+        num_inference_steps: Optional[int] = None,
+        guidance_scale: Optional[float] = None,
+        seed: Optional[int] = None,
+        encode: Optional[EncodeOptions] = None,
+        model: Optional[str] = None,
+        priority: Optional[str] = None,
+        client: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> GenerationJob:
+        """
+        Fill in defaults from settings for any parameter not provided
+
+        Raises:
+            BucketPolicyError: If resolution buckets are configured and the
+                size cannot be served under RESOLUTION_POLICY
+            UnknownModelError: If the model variant is not configured
+        """
+        model = self.registry.resolve_name(model)
+        height = height or settings.DEFAULT_HEIGHT
+        width = width or settings.DEFAULT_WIDTH
+        bucket = None
+        if self.buckets:
+            height, width, bucket = resolve_bucket(height, width, self.buckets, settings.RESOLUTION_POLICY)
+
+        return GenerationJob(
+            prompt=prompt,
+            height=height,
+            width=width,
+            num_inference_steps=num_inference_steps or settings.DEFAULT_STEPS,
+            guidance_scale=guidance_scale if guidance_scale is not None else settings.DEFAULT_GUIDANCE_SCALE,
+            seed=seed,
+            encode=encode or resolve_encode_options(),
+            bucket=bucket,
+            model=model,
+            priority=priority,
+            client=client,
+            deadline=deadline
+        )
+
     def generate_image(
         self,
         prompt: str,
@@ -56,76 +181,243 @@ class ImageGenerator:
         Returns:
             tuple: (PIL Image, image filename)
         """
-        if self.pipeline is None:
-            self.initialize()
+        job = self.resolve_job(prompt, height, width, num_inference_steps, guidance_scale, seed)
+        result = self.generate_batch([job])[0]
+        return result.image, self.save_encoded(result.data, job.encode.extension)
 
-        # Use defaults from settings if not provided
-        height = height or settings.DEFAULT_HEIGHT
-        width = width or settings.DEFAULT_WIDTH
-        num_inference_steps = num_inference_steps or settings.DEFAULT_STEPS
-        guidance_scale = guidance_scale if guidance_scale is not None else settings.DEFAULT_GUIDANCE_SCALE
+    @property
+    def streams(self) -> int:
+        """Number of pipeline runs that can execute in parallel"""
+        manager = self.registry.get()
+        return manager.pool.size if manager.pool is not None else 1
+
+    def estimate_seconds(self, jobs: list[GenerationJob]) -> float:
+        """Estimated pipeline time for running jobs that share one batch key"""
+        return self.cost_model.estimate(jobs[0].model, sum(job.work_units for job in jobs))
+
+    def model_id_for(self, job: GenerationJob) -> str:
+        """Identity of the model a job runs on, used to key caches"""
+        return self.registry.get(job.model).model_id
 
-        logger.info(f"Generating image with prompt: {prompt[:50]}...")
-        logger.info(f"Parameters: {height}x{width}, steps={num_inference_steps}, "
-                   f"guidance={guidance_scale}, seed={seed}")
+    def generate_batch(
+        self,
+        jobs: list[GenerationJob],
+        on_step: Optional[StepCallback] = None,
+        observe_cost: bool = True
+    ) -> list[GeneratedImage]:
+        """
+        Generate images for several jobs in a single pipeline call
+
+        All jobs must share the same batch key (model, run resolution, steps and guidance).
+        Each job gets its own seeded generator so results match what the job
+        would produce when run on its own. Images are encoded in memory;
+        persisting them is left to the caller.
+
+        Args:
+            jobs: Resolved generation jobs
+            on_step: Optional callback invoked after every denoising step
+            observe_cost: False to keep the run out of the cost model (warm-up)
+
+        Returns:
+            list: GeneratedImage for each job, in order
+        """
+        first = jobs[0]
+        if any(job.batch_key != first.batch_key for job in jobs):
+            raise ValueError("All jobs in a batch must share model, resolution, steps and guidance")
+        run_height, run_width = first.run_size
+        labels = {"resolution": f"{run_height}x{run_width}", "steps": first.num_inference_steps}
+        if all(job.cancelled for job in jobs):
+            self.metrics.generations.inc(len(jobs), **labels, status="cancelled")
+            raise GenerationCancelled(0, first.num_inference_steps)
+
+        logger.info(f"Generating {len(jobs)} image(s), first prompt: {first.prompt[:50]}...")
+        logger.info(f"Parameters: model={first.model}, {run_height}x{run_width}, steps={first.num_inference_steps}, "
+                   f"guidance={first.guidance_scale}, seeds={[job.seed for job in jobs]}")
 
         try:
-            # Set up generator for reproducibility
-            generator = None
-            if seed is not None:
-                generator = torch.Generator("cpu").manual_seed(seed)
-
-            # Generate image
-            result = self.pipeline(
-                prompt=prompt,
-                height=height,
-                width=width,
-                num_inference_steps=num_inference_steps,
-                guidance_scale=guidance_scale,
-                generator=generator
-            )
+            start = time.perf_counter()
 
-            image = result.images[0]
+            # Set up generators for reproducibility
+            if len(jobs) == 1:
+                generator = None
+                if first.seed is not None:
+                    generator = torch.Generator("cpu").manual_seed(first.seed)
+            else:
+                generator = [
+                    torch.Generator("cpu").manual_seed(
+                        job.seed if job.seed is not None else random.randrange(2 ** 32)
+                    )
+                    for job in jobs
+                ]
 
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"image_{timestamp}_{unique_id}.png"
-            filepath = self.output_dir / filename
+            # Generate images on whichever stream of the variant is free
+            with self.registry.use(first.model) as manager, \
+                    self._acquire_pipeline(manager, first, len(jobs)) as pipeline:
+                prompt_inputs = self._prompt_inputs(manager, pipeline, jobs)
+                step_marks = [time.perf_counter()]
+                result = pipeline(
+                    **prompt_inputs,
+                    height=run_height,
+                    width=run_width,
+                    num_inference_steps=first.num_inference_steps,
+                    guidance_scale=first.guidance_scale,
+                    generator=generator,
+                    callback_on_step_end=self._step_callback(jobs, on_step, step_marks, labels["resolution"]),
+                    callback_on_step_end_tensor_inputs=["latents"]
+                )
+                finished = time.perf_counter()
+                self.metrics.vae_decode.observe(finished - step_marks[-1], resolution=labels["resolution"])
+                # Fit the cost model on the denoise and decode time only, not on model loads or compiles;
+                # the first run of a pipeline at a shape includes OpenVINO's compile and first inference
+                shape = (id(pipeline), run_height, run_width, len(jobs))
+                with self._stats_lock:
+                    cold = shape not in self._warm_shapes
+                    self._warm_shapes.add(shape)
+                if observe_cost and not cold:
+                    self.cost_model.observe(first.model, sum(job.work_units for job in jobs),
+                                            finished - step_marks[0])
 
-            # Save image
-            image.save(filepath)
-            logger.info(f"Image saved to {filepath}")
+            logger.info(f"Pipeline finished {len(jobs)} image(s) in {time.perf_counter() - start:.2f}s")
 
-            # Clean up old images if necessary
-            self._cleanup_old_images()
+            if len(result.images) != len(jobs):
+                raise RuntimeError(f"Pipeline returned {len(result.images)} images for {len(jobs)} prompts")
 
-            return image, filename
+            outputs = []
+            for job, image in zip(jobs, result.images):
+                # Padded to a larger bucket, rendered smaller under overload, or both
+                image = fit_to_size(image, job.width, job.height)
+                encode_start = time.perf_counter()
+                data = encode_image(image, job.encode)
+                self.metrics.image_encode.observe(time.perf_counter() - encode_start, format=job.encode.format)
+                outputs.append(GeneratedImage(image=image, data=data))
 
+            self.metrics.generations.inc(len(jobs), **labels, status="completed")
+            return outputs
+
+        except GenerationCancelled as e:
+            self.metrics.generations.inc(len(jobs), **labels, status="cancelled")
+            with self._stats_lock:
+                self._aborted_runs += 1
+                self._skipped_steps += e.total - e.step
+            logger.info(f"{e}, all {len(jobs)} job(s) abandoned")
+            raise
         except Exception as e:
+            self.metrics.generations.inc(len(jobs), **labels, status="failed")
             logger.error(f"Image generation failed: {e}")
             raise RuntimeError(f"Failed to generate image: {e}")
 
-    def get_image_path(self, filename: str) -> Path:
-        """Get full path for an image filename"""
-        return self.output_dir / filename
+    @staticmethod
+    @contextmanager
+    def _acquire_pipeline(manager: ModelManager, job: GenerationJob, batch_size: int) -> Iterator[Any]:
+        """Borrow a static-shape pipeline for bucketed jobs, or a dynamic one otherwise"""
+        # Static shapes are compiled without the doubled classifier-free guidance batch
+        static_buckets = manager.static_buckets
+        if static_buckets is not None and job.bucket is not None and job.guidance_scale <= 1.0:
+            with static_buckets.acquire(*job.bucket, batch_size) as pipeline:
+                if pipeline is not None:
+                    yield pipeline
+                    return
+        with manager.pool.acquire() as pipeline:
+            yield pipeline
 
-    def _cleanup_old_images(self):
-        """Remove oldest images if storage limit is exceeded"""
-        try:
-            images = sorted(
-                self.output_dir.glob("*.png"),
-                key=lambda p: p.stat().st_mtime
+    def _step_callback(
+        self,
+        jobs: list[GenerationJob],
+        on_step: Optional[StepCallback],
+        step_marks: list[float],
+        resolution: str
+    ) -> Callable:
+        """
+        Build a diffusers callback_on_step_end that reports progress, times
+        each step and aborts at the step boundary once every job has been
+        cancelled
+
+        The end time of every step is appended to step_marks, whose first
+        entry is the start of the pipeline call.
+        """
+        def callback(pipe, step: int, timestep, callback_kwargs: dict) -> dict:
+            now = time.perf_counter()
+            self.metrics.denoise_step.observe(now - step_marks[-1], resolution=resolution)
+            step_marks.append(now)
+            total = getattr(pipe, "num_timesteps", None) or jobs[0].num_inference_steps
+            if all(job.cancelled for job in jobs):
+                raise GenerationCancelled(step + 1, total)
+            if on_step is not None:
+                on_step(step + 1, total, callback_kwargs.get("latents"))
+            return callback_kwargs
+        return callback
+
+    def _prompt_inputs(self, manager: ModelManager, pipeline: Any, jobs: list[GenerationJob]) -> dict:
+        """Build the pipeline prompt arguments, using cached embeddings when possible"""
+        prompts = [job.prompt for job in jobs]
+        if not hasattr(pipeline, "encode_prompt"):
+            return {"prompt": prompts[0] if len(prompts) == 1 else prompts}
+
+        encode = lambda missing: self._encode_prompts(pipeline, missing)
+        if self.embedding_cache.enabled:
+            # Variants with the same text encoder produce the same embeddings
+            model_id = manager.text_encoder_id
+            lookup = lambda texts: self.embedding_cache.get_or_encode(model_id, texts, encode)
+        elif len(set(prompts)) < len(prompts):
+            # Seed sweeps repeat one prompt; encode each distinct prompt once even without the cache
+            lookup = lambda texts: self._encode_unique(texts, encode)
+        else:
+            return {"prompt": prompts[0] if len(prompts) == 1 else prompts}
+
+        inputs = {"prompt_embeds": lookup(prompts)}
+        # Classifier-free guidance also needs embeddings for the empty negative prompt
+        if jobs[0].guidance_scale > 1.0:
+            inputs["negative_prompt_embeds"] = lookup([""] * len(prompts))
+        return inputs
+
+    @staticmethod
+    def _encode_unique(prompts: list[str], encode: Callable[[list[str]], list]) -> list:
+        """Encode each distinct prompt once and return one embedding per prompt"""
+        unique = list(dict.fromkeys(prompts))
+        embeddings = dict(zip(unique, encode(unique)))
+        return [embeddings[prompt] for prompt in prompts]
+
+    def _encode_prompts(self, pipeline: Any, prompts: list[str]) -> list:
+        """Run the text encoder for prompts missing from the embedding cache"""
+        start = time.perf_counter()
+        with torch.no_grad():
+            prompt_embeds, _ = pipeline.encode_prompt(
+                prompt=prompts,
+                do_classifier_free_guidance=False
             )
+        self.metrics.text_encode.observe(time.perf_counter() - start)
+        return list(prompt_embeds)
 
-            if len(images) > settings.MAX_STORED_IMAGES:
-                num_to_delete = len(images) - settings.MAX_STORED_IMAGES
-                for image_path in images[:num_to_delete]:
-                    image_path.unlink()
-                    logger.info(f"Deleted old image: {image_path.name}")
+    def get_stats(self) -> dict:
+        """Get counters for runs aborted because every caller went away"""
+        with self._stats_lock:
+            return {
+                "aborted_runs": self._aborted_runs,
+                "skipped_steps": self._skipped_steps,
+            }
 
-        except Exception as e:
-            logger.warning(f"Failed to cleanup old images: {e}")
+    @staticmethod
+    def new_filename(extension: str = ".png") -> str:
+        """Create a unique filename for a generated image"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        return f"image_{timestamp}_{unique_id}{extension}"
+
+    def save_encoded(self, data: bytes, extension: str = ".png", filename: Optional[str] = None) -> str:
+        """Save encoded image bytes to the output directory and return the filename"""
+        filename = filename or self.new_filename(extension)
+        filepath = self.output_dir / filename
+
+        start = time.perf_counter()
+        filepath.write_bytes(data)
+        self.metrics.save.observe(time.perf_counter() - start)
+        self.store.add(filename, len(data))
+        logger.info(f"Image saved to {filepath}")
+        return filename
+
+    def get_image_path(self, filename: str) -> Path:
+        """Get full path for an image filename"""
+        return self.output_dir / filename
 
 
 # Global generator instance
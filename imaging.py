@@ -0,0 +1,178 @@
+"""
+Image encoding for Z-Image-Turbo
+
+Encodes generated images to PNG, JPEG or WebP with configurable
+speed/size trade-offs, and renders cheap previews from intermediate latents.
+"""
+import base64
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+
+# format name -> (file extension, media type, Pillow format)
+FORMATS = {
+    "png": (".png", "image/png", "PNG"),
+    "jpeg": (".jpg", "image/jpeg", "JPEG"),
+    "webp": (".webp", "image/webp", "WEBP"),
+}
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+
+IMAGE_EXTENSIONS = set(MEDIA_TYPES)
+
+# Linear projection from the 16 Flux-VAE latent channels used by Z-Image to RGB.
+# Only approximates the decoded colours; previews are normalised afterwards.
+LATENT_RGB_FACTORS = np.array([
+    [-0.0346, 0.0244, 0.0681],
+    [0.0034, 0.0210, 0.0687],
+    [0.0275, -0.0668, -0.0433],
+    [-0.0174, 0.0160, 0.0617],
+    [0.0859, 0.0721, 0.0329],
+    [0.0004, 0.0383, 0.0115],
+    [0.0405, 0.0861, 0.0915],
+    [-0.0236, -0.0185, -0.0259],
+    [-0.0245, 0.0250, 0.1180],
+    [0.1008, 0.0755, -0.0421],
+    [-0.0515, 0.0201, 0.0011],
+    [0.0428, -0.0012, -0.0036],
+    [0.0817, 0.0765, 0.0749],
+    [-0.1264, -0.0522, -0.1103],
+    [-0.0280, -0.0881, -0.0499],
+    [-0.1262, -0.0982, -0.0778],
+], dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """Output format and encoder settings for a generated image"""
+    format: str = "png"
+    quality: int = 90  # JPEG and lossy WebP
+    compress_level: int = 6  # PNG, 0 (fastest) to 9 (smallest)
+    lossless: bool = False  # WebP only
+
+    @property
+    def extension(self) -> str:
+        return FORMATS[self.format][0]
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.format][1]
+
+    def cache_fields(self) -> dict:
+        """Settings that change the encoded bytes, for cache keys"""
+        if self.format == "png":
+            return {"format": "png", "compress_level": self.compress_level}
+        if self.format == "webp" and self.lossless:
+            return {"format": "webp", "lossless": True}
+        return {"format": self.format, "quality": self.quality}
+
+
+def resolve_encode_options(
+    format: Optional[str] = None,
+    quality: Optional[int] = None,
+    compress_level: Optional[int] = None,
+    lossless: Optional[bool] = None
+) -> EncodeOptions:
+    """Fill in server defaults for any encoder setting not provided"""
+    format = (format or settings.OUTPUT_FORMAT).lower()
+    if format == "jpg":
+        format = "jpeg"
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported output format: {format}")
+
+    if quality is None:
+        quality = settings.WEBP_QUALITY if format == "webp" else settings.JPEG_QUALITY
+
+    return EncodeOptions(
+        format=format,
+        quality=quality,
+        compress_level=compress_level if compress_level is not None else settings.PNG_COMPRESS_LEVEL,
+        lossless=lossless if lossless is not None else settings.WEBP_LOSSLESS
+    )
+
+
+def encode_image(image: Image.Image, options: EncodeOptions) -> bytes:
+    """Encode an image in memory with the given options"""
+    buffer = io.BytesIO()
+    pil_format = FORMATS[options.format][2]
+
+    if options.format == "png":
+        image.save(buffer, format=pil_format, compress_level=options.compress_level)
+    elif options.format == "jpeg":
+        image.convert("RGB").save(buffer, format=pil_format, quality=options.quality)
+    else:
+        image.save(buffer, format=pil_format, quality=options.quality, lossless=options.lossless)
+
+    return buffer.getvalue()
+
+
+def fit_to_size(image: Image.Image, width: int, height: int) -> Image.Image:
+    """
+    Bring a pipeline output to the requested size without distorting it
+
+    The centre is cropped to the requested aspect ratio (all of the padding
+    when the render is larger in both dimensions), then the crop is upscaled
+    if it is still smaller than requested.
+    """
+    if image.size == (width, height):
+        return image
+    if image.width >= width and image.height >= height:
+        crop_width, crop_height = width, height
+    elif image.width * height > width * image.height:
+        crop_width, crop_height = round(image.height * width / height), image.height
+    else:
+        crop_width, crop_height = image.width, round(image.width * height / width)
+    left = (image.width - crop_width) // 2
+    top = (image.height - crop_height) // 2
+    image = image.crop((left, top, left + crop_width, top + crop_height))
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.LANCZOS)
+    return image
+
+
+def media_type_for(filename: str) -> str:
+    """Content type for a stored image filename"""
+    return MEDIA_TYPES.get(Path(filename).suffix.lower(), "application/octet-stream")
+
+
+def latent_preview(latents: Any, index: int = 0) -> Image.Image:
+    """
+    Render a low-resolution preview from intermediate latents without the VAE
+
+    Args:
+        latents: Latent tensor of shape (batch, channels, [frames,] height, width)
+        index: Batch item to render
+
+    Returns:
+        Image: RGB preview at latent resolution
+    """
+    array = latents[index].detach().float().cpu().numpy() if hasattr(latents, "detach") else np.asarray(latents[index])
+    if array.ndim == 4:
+        array = array[:, 0]
+
+    if array.shape[0] == LATENT_RGB_FACTORS.shape[0]:
+        rgb = np.einsum("chw,cr->hwr", array, LATENT_RGB_FACTORS)
+    else:
+        rgb = np.moveaxis(array[:3], 0, -1)
+
+    # Stretch each channel to the full range; the projection is only approximate
+    low = np.percentile(rgb, 1, axis=(0, 1))
+    high = np.percentile(rgb, 99, axis=(0, 1))
+    rgb = np.clip((rgb - low) / np.maximum(high - low, 1e-6), 0.0, 1.0)
+    return Image.fromarray((rgb * 255).astype(np.uint8))
+
+
+def to_data_uri(data: bytes, media_type: str) -> str:
+    """Embed encoded image bytes in a data: URI"""
+    return f"data:{media_type};base64,{base64.b64encode(data).decode('ascii')}"
@@ -0,0 +1,302 @@
+"""
+Persistent asynchronous job queue for Z-Image-Turbo
+
+Jobs submitted through the /jobs API are written to a local SQLite database
+before they are acknowledged, then fed to the inference pipeline by a
+dispatcher running on the event loop. Queued and interrupted jobs survive a
+restart and are picked up again in submission order. Database calls run in
+worker threads, so a slow disk (every write is a WAL commit) never stalls
+the event loop.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from config import PROJECT_ROOT, settings
+from executor import QueueFullError
+from generator import GenerationJob
+from imaging import EncodeOptions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    filename TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+"""
+
+# Seconds between purges of expired finished jobs
+_PURGE_INTERVAL = 600
+
+
+class JobQueueFullError(Exception):
+    """Raised when the persistent queue already holds the maximum number of jobs"""
+
+
+@dataclass
+class JobRecord:
+    """Stored state of an asynchronous job"""
+    id: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    queue_position: Optional[int] = None
+
+
+class JobQueue:
+    """SQLite-backed job queue with a dispatcher feeding the inference pipeline"""
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        max_active: Optional[int] = None,
+        max_queued: Optional[int] = None
+    ):
+        """
+        Args:
+            db_path: SQLite database file (default from settings)
+            max_active: Jobs handed to the pipeline at once
+            max_queued: Maximum number of jobs waiting in the queue
+        """
+        self.run: Optional[Callable[[GenerationJob], Awaitable[str]]] = None
+        self.db_path = db_path or PROJECT_ROOT / settings.JOBS_DB
+        self.max_active = max_active or settings.JOBS_MAX_ACTIVE
+        self.max_queued = max_queued if max_queued is not None else settings.JOBS_MAX_QUEUED
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+        self._active: set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        self._retry_after = 0.0
+
+        # Jobs that were running when the server stopped start over
+        with self._lock:
+            recovered = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            ).rowcount
+            queued = self._count(QUEUED)
+        logger.info(f"Job queue opened at {self.db_path}: {queued} queued ({recovered} recovered)")
+
+    def start(self, run: Callable[[GenerationJob], Awaitable[str]]):
+        """
+        Start the dispatcher on the running event loop
+
+        Args:
+            run: Generates a job and returns the saved image filename
+        """
+        if self._dispatcher is None:
+            self.run = run
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        """Stop the dispatcher; jobs in flight are requeued on the next start"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            for task in list(self._active):
+                task.cancel()
+            await asyncio.gather(self._dispatcher, *self._active, return_exceptions=True)
+            self._dispatcher = None
+
+    async def submit(self, job: GenerationJob) -> JobRecord:
+        """
+        Persist a job and return its record
+
+        The job's priority class and API key name are stored with it, so it
+        is still scheduled and limited as its caller after a restart. Jobs
+        have no deadline: they are meant to wait as long as the queue needs.
+        """
+        record = await asyncio.to_thread(self._insert, job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return record
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        """Look up a job, including its position in the queue if still waiting"""
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _insert(self, job: GenerationJob) -> JobRecord:
+        params = {
+            "prompt": job.prompt,
+            "height": job.height,
+            "width": job.width,
+            "num_inference_steps": job.num_inference_steps,
+            "guidance_scale": job.guidance_scale,
+            "seed": job.seed,
+            "encode": asdict(job.encode),
+            "bucket": job.bucket,
+            "model": job.model,
+            "priority": job.priority,
+            "client": job.client,
+        }
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self.max_queued > 0 and self._count(QUEUED) >= self.max_queued:
+                raise JobQueueFullError(f"Job queue is full ({self.max_queued} jobs)")
+            self._db.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), time.time())
+            )
+        return self._get(job_id)
+
+    def _get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT seq, id, status, created_at, started_at, finished_at, filename, error "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            seq, *fields = row
+            record = JobRecord(*fields)
+            if record.status == QUEUED:
+                record.queue_position = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND seq < ?", (QUEUED, seq)
+                ).fetchone()[0]
+        return record
+
+    def _count(self, status: str) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def _claim_next(self) -> Optional[tuple[str, GenerationJob]]:
+        """Mark the oldest queued job as running and return it"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, params FROM jobs WHERE status = ? ORDER BY seq LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, params = row
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id)
+            )
+
+        params = json.loads(params)
+        encode = EncodeOptions(**params.pop("encode"))
+        bucket = params.pop("bucket", None)
+        return job_id, GenerationJob(**params, encode=encode, bucket=tuple(bucket) if bucket else None)
+
+    def _finish(self, job_id: str, status: str, filename: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, filename = ?, error = ? WHERE id = ?",
+                (status, time.time(), filename, error, job_id)
+            )
+
+    def _requeue(self, job_id: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE id = ?", (QUEUED, job_id)
+            )
+
+    def _purge_expired(self):
+        """Delete finished jobs older than the retention period"""
+        if settings.JOBS_RETENTION_HOURS <= 0:
+            return
+        cutoff = time.time() - settings.JOBS_RETENTION_HOURS * 3600
+        with self._lock:
+            purged = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (COMPLETED, FAILED, cutoff)
+            ).rowcount
+        if purged:
+            logger.info(f"Purged {purged} expired jobs")
+
+    async def _dispatch_loop(self):
+        while True:
+            if time.monotonic() - self._last_purge > _PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                await asyncio.to_thread(self._purge_expired)
+
+            # Back off while the inference queue is rejecting work
+            if self._retry_after:
+                await asyncio.sleep(self._retry_after)
+                self._retry_after = 0.0
+
+            while len(self._active) < self.max_active:
+                claimed = await asyncio.to_thread(self._claim_next)
+                if claimed is None:
+                    break
+                task = asyncio.create_task(self._run_job(*claimed))
+                self._active.add(task)
+                task.add_done_callback(self._active.discard)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_PURGE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_job(self, job_id: str, job: GenerationJob):
+        try:
+            filename = await self.run(job)
+        except QueueFullError as e:
+            # The executor is saturated by other traffic; try again later
+            await asyncio.to_thread(self._requeue, job_id)
+            self._retry_after = max(self._retry_after, float(e.retry_after))
+        except asyncio.CancelledError:
+            # Not awaited: the task is being cancelled, and the write must happen regardless
+            self._requeue(job_id)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await asyncio.to_thread(self._finish, job_id, FAILED, error=str(e))
+        else:
+            await asyncio.to_thread(self._finish, job_id, COMPLETED, filename=filename)
+        finally:
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def get_stats(self) -> dict:
+        """Get job counts by status; blocks on the database, call it off the event loop"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "completed": counts.get(COMPLETED, 0),
+            "failed": counts.get(FAILED, 0),
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+        }
+
+
+# Global job queue instance
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get or create global job queue instance"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -32,6 +32,7 @@ if getattr(sys, 'frozen', False):
 import uvicorn
 
 from config import settings
+from imaging import IMAGE_EXTENSIONS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -47,7 +48,9 @@ def cleanup_generated_images():
         if output_dir.exists():
             logger.info(f"Cleaning up old images in {output_dir}...")
             count = 0
-            for file_path in output_dir.glob("*.png"):
+            for file_path in output_dir.iterdir():
+                if file_path.suffix.lower() not in IMAGE_EXTENSIONS:
+                    continue
                 try:
                     file_path.unlink()
                     count += 1
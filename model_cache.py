@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Compiled model cache for Z-Image-Turbo
+
+OpenVINO can save compiled models to CACHE_DIR and import them on the next
+start instead of compiling the IR again. This module gives every combination
+of model, device and compile config its own cache directory under the
+project root, so changing any of them (or re-exporting the IR) starts from a
+clean cache instead of reusing stale blobs. Run it directly to prebuild the
+cache before shipping a bundle:
+
+    python model_cache.py
+"""
+import hashlib
+import json
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from config import PROJECT_ROOT, settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class CacheEntry:
+    """Cache directory for one model, device and compile config"""
+    key: str
+    path: Path
+    warm: bool  # Compiled blobs from an earlier load are present
+
+
+def _model_label(model_path: Path) -> str:
+    """Model path relative to the project root when possible, so bundles can move"""
+    try:
+        return model_path.resolve().relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        return str(model_path.resolve())
+
+
+def ir_fingerprint(model_path: Path) -> str:
+    """
+    Hash the IR topology files and the sizes of the weight files
+
+    Re-exporting the model changes the .xml files; hashing the multi-gigabyte
+    .bin files on every start would cost more than it saves, so only their
+    sizes are included. OpenVINO also checks each blob against the model
+    before importing it.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(model_path.rglob("*")):
+        if path.suffix == ".xml":
+            digest.update(path.relative_to(model_path).as_posix().encode("utf-8"))
+            digest.update(path.read_bytes())
+        elif path.suffix == ".bin":
+            digest.update(f"{path.relative_to(model_path).as_posix()}:{path.stat().st_size}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Managed OpenVINO CACHE_DIR keyed by everything that affects compiled blobs"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or PROJECT_ROOT / settings.MODEL_CACHE_DIR
+
+    def entry_for(self, model_path: Path, device: str, ov_config: dict, overrides: dict) -> CacheEntry:
+        """Find or create the cache directory for a model, device and compile config"""
+        try:
+            import openvino
+            runtime = openvino.get_version()
+        except Exception:
+            runtime = "unknown"
+
+        identity = {
+            "model": _model_label(model_path),
+            "precision": model_path.name,
+            "device": device,
+            "ov_config": ov_config,
+            "overrides": overrides,
+            "ir": ir_fingerprint(model_path),
+            "openvino": runtime,
+        }
+        key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        path = self.root / key
+        warm = (path / MANIFEST).exists()
+
+        self._prune(identity, key)
+        path.mkdir(parents=True, exist_ok=True)
+        if not warm:
+            (path / "identity.json").write_text(json.dumps(identity, indent=2, sort_keys=True))
+        return CacheEntry(key=key, path=path, warm=warm)
+
+    def mark_built(self, entry: CacheEntry, compile_seconds: float):
+        """Record that the cache directory holds a complete set of compiled blobs"""
+        manifest = {"built_at": time.time(), "compile_seconds": round(compile_seconds, 2)}
+        (entry.path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+    def _prune(self, identity: dict, keep: str):
+        """
+        Delete cache directories for the same model and config built from an
+        older IR or OpenVINO release; other configs are left alone
+        """
+        if not self.root.exists():
+            return
+        for path in self.root.iterdir():
+            if not path.is_dir() or path.name == keep:
+                continue
+            try:
+                other = json.loads((path / "identity.json").read_text())
+            except (OSError, ValueError):
+                continue
+            if all(other.get(field) == identity[field] for field in ("model", "device", "ov_config", "overrides")):
+                logger.info(f"Removing stale compiled model cache {path.name}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    def get_stats(self) -> dict:
+        """Get cache directories and their total size"""
+        entries = 0
+        size = 0
+        if self.root.exists():
+            for path in self.root.iterdir():
+                if path.is_dir():
+                    entries += 1
+                    size += sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+        return {"dir": str(self.root), "entries": entries, "bytes": size}
+
+
+# Global model cache instance
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """Get or create global model cache instance"""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache()
+    return _model_cache
+
+
+def prebuild() -> bool:
+    """Load and compile every model variant once so that the cache is populated"""
+    from model_manager import get_model_registry
+
+    if not settings.MODEL_CACHE_ENABLED:
+        logger.warning("MODEL_CACHE_ENABLED is off, nothing to prebuild")
+        return False
+    for manager in get_model_registry().managers.values():
+        try:
+            manager.load_model()
+        except Exception as e:
+            logger.error(f"Failed to prebuild compiled model cache for {manager.name}: {e}")
+            return False
+        # One variant at a time, so prebuilding fits in the same memory as serving
+        manager.unload()
+    logger.info(f"Compiled model cache ready in {get_model_cache().root}")
+    return True
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if prebuild() else 1)
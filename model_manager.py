@@ -1,47 +1,266 @@
 """
 Model loading manager for Z-Image-Turbo with OpenVINO
+
+Several model variants (for example INT4 and FP16) can be configured side by
+side. The registry loads them on first use, keeps the loaded weights within
+a memory budget by unloading the least recently used idle variant, and
+loads identical text encoders only once.
 """
+import gc
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Iterator, Optional
 
+from buckets import StaticBucketCache, parse_buckets
 from config import settings
+from metrics import get_metrics
+from model_cache import CacheEntry, get_model_cache, ir_fingerprint
+from pipeline_pool import PipelinePool, resolve_streams, share_compiled
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pipeline components that can be given their own OpenVINO config
+COMPONENTS = ("text_encoder", "transformer", "vae_decoder")
+
+# Properties reported by /info as applied by the device
+REPORTED_PROPERTIES = (
+    "PERFORMANCE_HINT",
+    "NUM_STREAMS",
+    "INFERENCE_NUM_THREADS",
+    "INFERENCE_PRECISION_HINT",
+    "ENABLE_CPU_PINNING",
+    "ENABLE_HYPER_THREADING",
+    "OPTIMAL_NUMBER_OF_INFER_REQUESTS",
+)
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request names a model variant that is not configured"""
+
+
+def _weights_bytes(path: Path) -> int:
+    """Total size of the IR weight files under a directory"""
+    return sum(f.stat().st_size for f in path.rglob("*.bin")) if path.exists() else 0
+
 
 class ModelManager:
-    """Manages OpenVINO model loading"""
+    """Manages OpenVINO model loading for one model variant"""
 
-    def __init__(self):
-        self.model_path = settings.get_model_path()
+    def __init__(self, name: str = "default", model_path: Optional[Path] = None):
+        self.name = name
+        self.model_path = model_path or settings.get_model_path()
         self.device = settings.DEVICE
         self.pipeline = None
+        self.pool: Optional[PipelinePool] = None
+        self.static_buckets: Optional[StaticBucketCache] = None
+        self.streams = 1
+        self.cache_entry: Optional[CacheEntry] = None
+        self.load_seconds: Optional[float] = None
+        self.shares_text_encoder = False
+
+        self._text_encoder_id: Optional[str] = None
+
+    @property
+    def model_id(self) -> str:
+        """Identity of the model, used to key result caches"""
+        return f"{self.model_path}:{self.device}"
+
+    @property
+    def text_encoder_id(self) -> str:
+        """
+        Identity of the text encoder weights, used to key prompt embeddings
+
+        Variants built from the same text encoder share the same id, so they
+        also share cached embeddings.
+        """
+        if self._text_encoder_id is None:
+            text_encoder_dir = self.model_path / "text_encoder"
+            if text_encoder_dir.exists():
+                self._text_encoder_id = f"text_encoder:{ir_fingerprint(text_encoder_dir)[:16]}:{self.device}"
+            else:
+                self._text_encoder_id = self.model_id
+        return self._text_encoder_id
+
+    @cached_property
+    def weights_bytes(self) -> int:
+        """Size of all weight files of this variant, measured once; budget checks run under the registry lock"""
+        return _weights_bytes(self.model_path)
+
+    @cached_property
+    def text_encoder_bytes(self) -> int:
+        """Size of the text encoder weight files of this variant, measured once"""
+        return _weights_bytes(self.model_path / "text_encoder")
 
-    def load_model(self):
-        """Load OpenVINO model pipeline"""
+    def _stream_config(self) -> dict:
+        """OpenVINO config for the requested number of concurrent streams"""
+        streams = settings.INFERENCE_STREAMS.strip().lower()
+        if streams == "auto":
+            return {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if int(streams) > 1:
+            return {"NUM_STREAMS": streams}
+        return {}
+
+    def build_ov_config(self) -> dict:
+        """OpenVINO config shared by all components, explicit settings override stream sizing"""
+        config = self._stream_config()
+        options = {
+            "PERFORMANCE_HINT": settings.OV_PERFORMANCE_HINT,
+            "NUM_STREAMS": settings.OV_NUM_STREAMS,
+            "INFERENCE_NUM_THREADS": settings.OV_INFERENCE_NUM_THREADS,
+            "INFERENCE_PRECISION_HINT": settings.OV_INFERENCE_PRECISION_HINT,
+            "ENABLE_CPU_PINNING": settings.OV_ENABLE_CPU_PINNING,
+            "ENABLE_HYPER_THREADING": settings.OV_ENABLE_HYPER_THREADING,
+        }
+        for key, value in options.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "YES" if value else "NO"
+            config[key] = str(value)
+        return config
+
+    @staticmethod
+    def component_overrides() -> dict[str, dict]:
+        """Per-component OpenVINO properties layered over the shared config"""
+        return {
+            "text_encoder": dict(settings.OV_TEXT_ENCODER_CONFIG),
+            "transformer": dict(settings.OV_TRANSFORMER_CONFIG),
+            "vae_decoder": dict(settings.OV_VAE_DECODER_CONFIG),
+        }
+
+    def load_model(self, shared_text_encoder: Any = None):
+        """
+        Load OpenVINO model pipeline
+
+        Args:
+            shared_text_encoder: Compiled text encoder of another loaded
+                variant with identical weights, used instead of compiling
+                this variant's own
+        """
         if self.pipeline is not None:
             logger.info("Model already loaded")
             return self.pipeline
 
         try:
-            from optimum.intel import OVZImagePipeline
+            if settings.PIPELINE_BACKEND == "simulated":
+                from simulated_pipeline import SimulatedPipeline as OVZImagePipeline
+            else:
+                from optimum.intel import OVZImagePipeline
 
             logger.info(f"Loading OpenVINO model from {self.model_path}")
             logger.info(f"Using device: {self.device}")
 
+            ov_config = self.build_ov_config()
+            logger.info(f"OpenVINO config: {ov_config or 'device defaults'}")
+            component_overrides = self.component_overrides()
+            if settings.MODEL_CACHE_ENABLED and settings.PIPELINE_BACKEND == "openvino":
+                self.cache_entry = get_model_cache().entry_for(
+                    self.model_path, self.device, ov_config, component_overrides
+                )
+                ov_config = {**ov_config, "CACHE_DIR": str(self.cache_entry.path)}
+
+            start = time.perf_counter()
             self.pipeline = OVZImagePipeline.from_pretrained(
                 str(self.model_path),
-                device=self.device
+                device=self.device,
+                ov_config=ov_config,
+                compile=False
             )
 
-            logger.info("Model loaded successfully")
+            # Layer component overrides before compiling, so each part compiles once
+            for name, overrides in component_overrides.items():
+                part = getattr(self.pipeline, name, None)
+                if part is not None and overrides:
+                    part.ov_config = {**part.ov_config, **overrides}
+                    logger.info(f"OpenVINO config for {name}: {part.ov_config}")
+            if shared_text_encoder is not None:
+                self.pipeline.text_encoder = share_compiled(shared_text_encoder)
+                self.shares_text_encoder = True
+                logger.info(f"Sharing an already loaded text encoder with variant {self.name}")
+            self.pipeline.compile()
+            self.load_seconds = time.perf_counter() - start
+            get_metrics().model_load.set(self.load_seconds, model=self.name)
+
+            if self.cache_entry is None:
+                logger.info(f"Model compiled in {self.load_seconds:.1f}s (compiled model cache disabled)")
+            elif self.cache_entry.warm:
+                logger.info(f"Model loaded from compiled cache {self.cache_entry.key} in {self.load_seconds:.1f}s")
+            else:
+                get_model_cache().mark_built(self.cache_entry, self.load_seconds)
+                logger.info(f"Cold compile took {self.load_seconds:.1f}s, "
+                            f"compiled model cache {self.cache_entry.key} written for next start")
+
+            # Streams share the compiled weights, each with its own infer requests
+            self.streams = resolve_streams(settings.INFERENCE_STREAMS, self.pipeline)
+            self.pool = PipelinePool.from_pipeline(self.pipeline, self.streams)
+            if parse_buckets(settings.RESOLUTION_BUCKETS) and settings.STATIC_BUCKETS:
+                self.static_buckets = StaticBucketCache(self.pipeline, self.streams)
+
+            logger.info(f"Model {self.name} loaded successfully")
             return self.pipeline
 
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise RuntimeError(f"Failed to load model from {self.model_path}: {e}")
 
+    def unload(self):
+        """Release the pipeline, its replicas and static-shape copies"""
+        if self.pipeline is None:
+            return
+        self.pipeline = None
+        self.pool = None
+        self.static_buckets = None
+        self.shares_text_encoder = False
+        gc.collect()
+        logger.info(f"Model {self.name} unloaded")
+
+    def get_info(self) -> dict:
+        """Describe the loaded model, its requested config and what each device applied"""
+        info: dict[str, Any] = {
+            "name": self.name,
+            "loaded": self.pipeline is not None,
+            "model_path": str(self.model_path),
+            "device": self.device,
+            "streams": self.streams,
+            "ov_config": self.build_ov_config(),
+            "load_seconds": self.load_seconds,
+            "shares_text_encoder": self.shares_text_encoder,
+            "model_cache": None,
+            "components": {},
+        }
+        if self.cache_entry is not None:
+            info["model_cache"] = {
+                "key": self.cache_entry.key,
+                "dir": str(self.cache_entry.path),
+                "hit": self.cache_entry.warm,
+            }
+        if self.pipeline is None:
+            return info
+
+        for name in COMPONENTS:
+            part = getattr(self.pipeline, name, None)
+            if part is None:
+                continue
+            effective = {}
+            compiled = getattr(part, "request", None)
+            for prop in REPORTED_PROPERTIES:
+                try:
+                    effective[prop] = str(compiled.get_property(prop))
+                except Exception:
+                    # Not compiled yet, or not supported by this device
+                    pass
+            info["components"][name] = {
+                "requested": dict(getattr(part, "ov_config", {}) or {}),
+                "effective": effective,
+            }
+        return info
+
     def initialize(self):
         """Initialize model by loading it"""
         return self.load_model()
@@ -53,16 +272,192 @@ class ModelManager:
         return self.pipeline
 
 
-# Global model manager instance
-_model_manager: Optional[ModelManager] = None
+class ModelRegistry:
+    """Model variants by name, loaded on demand within a memory budget"""
+
+    def __init__(self, variants: Optional[dict[str, Path]] = None, max_bytes: Optional[int] = None):
+        variants = variants or settings.get_model_variants()
+        self.managers = {name: ModelManager(name, path) for name, path in variants.items()}
+        self.default = settings.DEFAULT_MODEL or next(iter(self.managers))
+        if self.default not in self.managers:
+            raise ValueError(f"DEFAULT_MODEL '{self.default}' is not one of {list(self.managers)}")
+        self.max_bytes = max_bytes if max_bytes is not None else settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.managers}
+        self._in_use: dict[str, int] = {name: 0 for name in self.managers}
+        # Loaded variants, least recently used first
+        self._loaded: OrderedDict[str, None] = OrderedDict()
+        self._unloading: set[str] = set()
+
+        self.loads = 0
+        self.unloads = 0
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.managers)
+
+    def resolve_name(self, name: Optional[str]) -> str:
+        """Return the variant name for a request, the default if none is given"""
+        if not name:
+            return self.default
+        if name not in self.managers:
+            raise UnknownModelError(f"Unknown model '{name}', available: {', '.join(self.managers)}")
+        return name
+
+    def get(self, name: Optional[str] = None) -> ModelManager:
+        """Get the manager for a variant without loading it"""
+        return self.managers[self.resolve_name(name)]
+
+    def load(self, name: Optional[str] = None) -> ModelManager:
+        """Load a variant if it is not loaded yet and mark it as recently used"""
+        manager = self.get(name)
+        self._ensure_loaded(manager)
+        with self._lock:
+            # Without use() nothing keeps it in use, so another load may have evicted it since
+            if manager.name in self._loaded:
+                self._loaded.move_to_end(manager.name)
+        return manager
+
+    @contextmanager
+    def use(self, name: Optional[str] = None) -> Iterator[ModelManager]:
+        """Use a variant for one run, loading it first if needed; it is not unloaded while in use"""
+        manager = self.get(name)
+        with self._lock:
+            self._in_use[manager.name] += 1
+        try:
+            yield self.load(manager.name)
+        finally:
+            with self._lock:
+                self._in_use[manager.name] -= 1
+
+    def _ensure_loaded(self, manager: ModelManager):
+        with self._lock:
+            # A variant being unloaded is reloaded once its load lock is free again
+            if manager.pipeline is not None and manager.name not in self._unloading:
+                self._loaded.setdefault(manager.name)
+                return
+        with self._load_locks[manager.name]:
+            if manager.pipeline is not None:
+                return
+            self._make_room(manager)
+            manager.load_model(shared_text_encoder=self._shared_text_encoder(manager))
+            with self._lock:
+                self._loaded[manager.name] = None
+                self.loads += 1
+
+    def _shared_text_encoder(self, manager: ModelManager) -> Any:
+        """Compiled text encoder of a loaded variant with identical weights, if any"""
+        if not settings.SHARE_TEXT_ENCODER:
+            return None
+        for other in self.managers.values():
+            if other is not manager and other.pipeline is not None \
+                    and other.text_encoder_id == manager.text_encoder_id:
+                return other.pipeline.text_encoder
+        return None
+
+    def _resident_bytes(self, extra: Optional[ModelManager] = None) -> int:
+        """Estimated weights in memory, counting each shared text encoder once"""
+        managers = [self.managers[name] for name in self._loaded]
+        if extra is not None:
+            managers.append(extra)
+        total = 0
+        text_encoders = {}
+        for manager in managers:
+            total += manager.weights_bytes - manager.text_encoder_bytes
+            text_encoders[manager.text_encoder_id] = manager.text_encoder_bytes
+        return total + sum(text_encoders.values())
+
+    def _make_room(self, manager: ModelManager):
+        """Unload least recently used idle variants until the new one fits the budget"""
+        if self.max_bytes <= 0:
+            return
+        while True:
+            with self._lock:
+                if self._resident_bytes(extra=manager) <= self.max_bytes:
+                    return
+                candidates = [name for name in self._loaded if self._in_use[name] == 0 and name != manager.name]
+
+            victim = self._claim_victim(candidates)
+            if victim is None:
+                logger.warning(f"Loading {manager.name} exceeds the model memory budget, "
+                               f"all other variants are in use")
+                return
+            try:
+                logger.info(f"Unloading least recently used model {victim} to stay within the memory budget")
+                self.managers[victim].unload()
+            finally:
+                with self._lock:
+                    self._unloading.discard(victim)
+                self._load_locks[victim].release()
+
+    def _claim_victim(self, candidates: list[str]) -> Optional[str]:
+        """
+        Take the first candidate that is still idle out of the loaded set for unloading
+
+        The victim's load lock is held until it has been unloaded, so a run
+        that starts on it meanwhile waits and reloads it instead of using a
+        pipeline that is going away.
+        """
+        for name in candidates:
+            load_lock = self._load_locks[name]
+            if not load_lock.acquire(blocking=False):
+                continue
+            with self._lock:
+                if self._in_use[name] == 0 and name in self._loaded:
+                    del self._loaded[name]
+                    self._unloading.add(name)
+                    self.unloads += 1
+                    return name
+            load_lock.release()
+        return None
+
+    def get_info(self) -> dict:
+        """Describe every variant"""
+        return {
+            "default_model": self.default,
+            "models": {name: manager.get_info() for name, manager in self.managers.items()},
+        }
+
+    def get_stats(self) -> dict:
+        """Get loaded variants, estimated memory and load/unload counters"""
+        with self._lock:
+            variants = {}
+            for name, manager in self.managers.items():
+                variants[name] = {
+                    "loaded": manager.pipeline is not None,
+                    "in_use": self._in_use[name],
+                    "weights_bytes": manager.weights_bytes,
+                    "shares_text_encoder": manager.shares_text_encoder,
+                    "streams": manager.pool.get_stats() if manager.pool else None,
+                    "static_buckets": manager.static_buckets.get_stats() if manager.static_buckets else None,
+                }
+            return {
+                "default_model": self.default,
+                "loaded": list(self._loaded),
+                "resident_bytes": self._resident_bytes(),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "unloads": self.unloads,
+                "variants": variants,
+            }
+
+
+# Global model registry instance
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create global model registry instance"""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry()
+    return _model_registry
 
 
 def get_model_manager() -> ModelManager:
-    """Get or create global model manager instance"""
-    global _model_manager
-    if _model_manager is None:
-        _model_manager = ModelManager()
-    return _model_manager
+    """Get the model manager of the default variant"""
+    return get_model_registry().get()
 
 
 def initialize_model():
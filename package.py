@@ -54,6 +54,14 @@ def ensure_models_converted():
     return True
 
 
+def prebuild_model_cache():
+    """Compile the models once so the package ships with a warm compiled model cache"""
+    from model_cache import prebuild
+
+    logger.info("Prebuilding compiled model cache...")
+    return prebuild()
+
+
 def create_package_structure(package_dir: Path):
     """Create package directory structure"""
     logger.info(f"Creating package structure in {package_dir}")
@@ -70,8 +78,25 @@ def create_package_structure(package_dir: Path):
     source_files = [
         "main.py",
         "api.py",
+        "admission.py",
+        "api_keys.py",
+        "batcher.py",
+        "buckets.py",
+        "degradation.py",
+        "embedding_cache.py",
+        "executor.py",
         "generator.py",
+        "imaging.py",
+        "jobs.py",
+        "metrics.py",
+        "model_cache.py",
         "model_manager.py",
+        "pipeline_pool.py",
+        "result_cache.py",
+        "scheduler.py",
+        "simulated_pipeline.py",
+        "storage.py",
+        "warmup.py",
         "config.py",
         "pyproject.toml",
         "README.md",
@@ -93,6 +118,13 @@ def create_package_structure(package_dir: Path):
     else:
         logger.warning("Models directory not found. Package will need to download models on first run.")
 
+    # Copy compiled model cache so the package starts without recompiling
+    cache_dir = PROJECT_ROOT / "model_cache"
+    if cache_dir.exists():
+        logger.info("Copying compiled model cache...")
+        shutil.copytree(cache_dir, package_dir / "model_cache")
+        logger.info("  Compiled model cache copied")
+
     # Create output directory placeholder
     (package_dir / "generated_images").mkdir(exist_ok=True)
     (package_dir / "generated_images" / ".gitkeep").touch()
@@ -241,6 +273,11 @@ def main():
         action="store_true",
         help="Skip model conversion (models will be downloaded on first run)"
     )
+    parser.add_argument(
+        "--skip-prebuild",
+        action="store_true",
+        help="Skip prebuilding the compiled model cache (first start compiles the models)"
+    )
     parser.add_argument(
         "--output-dir",
         type=Path,
@@ -266,6 +303,11 @@ def main():
     else:
         logger.warning("Skipping model conversion. Package will download models on first run.")
 
+    # Prebuild compiled model cache
+    if not args.skip_models and not args.skip_prebuild:
+        if not prebuild_model_cache():
+            logger.warning("Compiled model cache was not prebuilt. Package will compile models on first start.")
+
     # Create package structure
     if not create_package_structure(args.output_dir):
         logger.error("Failed to create package structure")
@@ -0,0 +1,267 @@
+"""
+Deterministic result cache for Z-Image-Turbo
+
+Seeded generations are fully determined by their inputs, so their encoded
+images are stored under a content hash of those inputs in a size-bounded
+memory tier and an optional on-disk tier. Identical requests that arrive
+while the first one is still running share its pipeline call.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from config import PROJECT_ROOT, settings
+from generator import GenerationJob
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Content-addressed cache of encoded images with in-flight request coalescing"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_memory_bytes: Optional[int] = None,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.cache_dir = cache_dir or PROJECT_ROOT / settings.RESULT_CACHE_DIR
+        self.max_memory_bytes = (max_memory_bytes if max_memory_bytes is not None
+                                 else settings.RESULT_CACHE_MEMORY_MB * 1024 * 1024)
+        self.max_disk_bytes = (max_disk_bytes if max_disk_bytes is not None
+                               else settings.RESULT_CACHE_DISK_MB * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        # Disk entries in least-recently-used order: key -> size in bytes
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        if self.max_disk_bytes > 0:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(job: GenerationJob, model_id: str) -> str:
+        """Hash every input that determines a seeded generation's output"""
+        payload = json.dumps({
+            "prompt": job.prompt,
+            "height": job.height,
+            "width": job.width,
+            "num_inference_steps": job.num_inference_steps,
+            "guidance_scale": job.guidance_scale,
+            "seed": job.seed,
+            "model": model_id,
+            "encode": job.encode.cache_fields(),
+            "bucket": job.bucket,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_create(
+        self,
+        key: str,
+        create: Callable[[], Awaitable[bytes]]
+    ) -> tuple[bytes, str]:
+        """
+        Return cached bytes for a key, or create them once for all concurrent callers
+
+        Returns:
+            tuple: (encoded image bytes, source) where source is one of
+                "memory", "disk", "coalesced" or "generated"
+        """
+        data = self._get_memory(key)
+        if data is not None:
+            return data, "memory"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            data, _ = await self._wait_shared(key, task)
+            return data, "coalesced"
+
+        task = asyncio.ensure_future(self._load_or_create(key, create))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await self._wait_shared(key, task)
+
+    def contains(self, key: str) -> bool:
+        """Whether a key can be served without generating, from either tier or an in-flight creation"""
+        with self._lock:
+            return key in self._memory or key in self._disk or key in self._inflight
+
+    async def _wait_shared(self, key: str, task: asyncio.Task) -> tuple[bytes, str]:
+        """
+        Wait for a shared creation task
+
+        The task keeps running while at least one caller is waiting for it and
+        is cancelled when the last one goes away.
+        """
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                if not task.done():
+                    task.cancel()
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    async def _load_or_create(self, key: str, create: Callable[[], Awaitable[bytes]]) -> tuple[bytes, str]:
+        data = await asyncio.to_thread(self._get_disk, key)
+        if data is not None:
+            return data, "disk"
+
+        self.misses += 1
+        data = await create()
+        await asyncio.to_thread(self.put, key, data)
+        return data, "generated"
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return data
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+
+        path = self.cache_dir / key
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        self._put_memory(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store encoded bytes in the memory tier and, if enabled, on disk"""
+        self._put_memory(key, data)
+        if 0 < len(data) <= self.max_disk_bytes:
+            self._put_disk(key, data)
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self.evictions += 1
+
+    def _put_disk(self, key: str, data: bytes):
+        try:
+            tmp_path = self.cache_dir / f"{key}.tmp"
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, self.cache_dir / key)
+        except OSError as e:
+            logger.warning(f"Failed to write result cache entry {key}: {e}")
+            return
+
+        evicted = []
+        with self._lock:
+            old_size = self._disk.pop(key, None)
+            if old_size is not None:
+                self._disk_bytes -= old_size
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+
+            while self._disk_bytes > self.max_disk_bytes:
+                evicted_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.evictions += 1
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            try:
+                (self.cache_dir / evicted_key).unlink()
+            except OSError:
+                pass
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file modification times"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.info(f"Result cache loaded {len(self._disk)} entries "
+                    f"({self._disk_bytes / 1024 / 1024:.1f} MB) from {self.cache_dir}")
+
+    def get_stats(self) -> dict:
+        """Get cache sizes and hit/miss counters"""
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "inflight": len(self._inflight),
+            }
+
+
+# Global result cache instance
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get or create global result cache instance"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
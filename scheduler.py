@@ -0,0 +1,156 @@
+"""
+Scheduling of inference work: fair queuing across classes, a policy within each
+
+The inference executor takes its next task from this queue. Each priority
+class has its own queue and a weight; classes are served in order of virtual
+finish time (self-clocked fair queuing), so while several classes are
+backlogged each gets worker time in proportion to its weight, and a class
+with nothing queued leaves its share to the others. Task cost is the
+estimated runtime, so one 1024x1024 50-step job counts for as much as the
+many small jobs it would otherwise crowd out.
+
+Within a class, SCHEDULER_POLICY picks the next task:
+
+- fifo: arrival order
+- sjf: shortest estimated job first, aged so long jobs are not starved: a
+  task ranks by cost - aging * seconds waited
+- edf: earliest deadline first, from the client's X-Deadline or, without
+  one, SCHEDULER_DEFAULT_DEADLINE after arrival
+
+Every ranking is fixed when the task is queued (aging moves all waiting
+tasks at the same rate), so each class is a heap.
+"""
+import heapq
+import itertools
+import logging
+from typing import Any, Optional
+
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+POLICIES = ("fifo", "sjf", "edf")
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised for work that cannot finish before its client's deadline"""
+
+    def __init__(self, estimated_seconds: Optional[float] = None):
+        if estimated_seconds is None:
+            super().__init__("Deadline passed while the request was queued")
+        else:
+            super().__init__(f"Estimated completion in {estimated_seconds:.1f}s is past the deadline")
+        self.estimated_seconds = estimated_seconds
+
+
+def misses_deadline(task: Any, now: float) -> bool:
+    """Whether a task starting now would finish after it expires"""
+    return task.expires is not None and now + task.cost > task.expires
+
+
+class FairQueue:
+    """
+    Weighted fair queue of tasks across priority classes
+
+    Tasks need a priority (a class name, None for the default class), a cost
+    (estimated seconds), enqueued_at and deadline (time.monotonic() values,
+    deadline may be None); the queue sets their finish_tag. Not thread safe,
+    the executor calls it under its own lock.
+    """
+
+    def __init__(self, weights: dict[str, float], default_priority: str, policy: Optional[str] = None,
+                 aging: Optional[float] = None, default_deadline: Optional[float] = None):
+        self.weights = dict(weights)
+        self.default_priority = default_priority
+        self.policy = policy or settings.SCHEDULER_POLICY
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown scheduler policy '{self.policy}', expected one of {', '.join(POLICIES)}")
+        self.aging = aging if aging is not None else settings.SCHEDULER_AGING
+        self.default_deadline = (default_deadline if default_deadline is not None
+                                 else settings.SCHEDULER_DEFAULT_DEADLINE)
+
+        # Per class: heap of (rank, sequence, task)
+        self._queues: dict[str, list] = {name: [] for name in self.weights}
+        self._last_finish: dict[str, float] = {name: 0.0 for name in self.weights}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._length = 0
+
+        self.dispatched: dict[str, int] = {name: 0 for name in self.weights}
+
+    def priority_of(self, task: Any) -> str:
+        """The class a task is queued in; unknown classes fall back to the default"""
+        return task.priority if task.priority in self._queues else self.default_priority
+
+    def _rank(self, task: Any) -> float:
+        if self.policy == "sjf":
+            # cost - aging * (now - enqueued_at), minus the aging * now every task shares
+            return task.cost + self.aging * task.enqueued_at
+        if self.policy == "edf":
+            return task.deadline if task.deadline is not None else task.enqueued_at + self.default_deadline
+        return 0.0
+
+    def push(self, task: Any):
+        # Virtual time at arrival, so a class that was idle is not charged for the wait
+        task.virtual_arrival = self._virtual_time
+        heapq.heappush(self._queues[self.priority_of(task)], (self._rank(task), next(self._sequence), task))
+        self._length += 1
+
+    def pop(self) -> Any:
+        """Remove and return the next task: the class with the earliest virtual finish, its best task"""
+        best = None
+        for name, queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0][2]
+            finish = max(head.virtual_arrival, self._last_finish[name]) + max(head.cost, 1e-6) / self.weights[name]
+            if best is None or finish < best[0]:
+                best = (finish, name)
+
+        finish, name = best
+        task = heapq.heappop(self._queues[name])[2]
+        task.finish_tag = finish
+        self._last_finish[name] = finish
+        self._virtual_time = finish
+        self._length -= 1
+        self.dispatched[name] += 1
+        return task
+
+    def remove(self, task: Any) -> bool:
+        """Remove a queued task, False if it is not queued"""
+        queue = self._queues[self.priority_of(task)]
+        for index, entry in enumerate(queue):
+            if entry[2] is task:
+                queue[index] = queue[-1]
+                queue.pop()
+                heapq.heapify(queue)
+                self._length -= 1
+                return True
+        return False
+
+    def drain(self) -> list:
+        """Remove and return every queued task"""
+        tasks = [entry[2] for queue in self._queues.values() for entry in queue]
+        for queue in self._queues.values():
+            queue.clear()
+        self._length = 0
+        return tasks
+
+    def length(self, priority: Optional[str] = None) -> int:
+        """Queued tasks, in one class or in total"""
+        if priority is None:
+            return self._length
+        return len(self._queues[priority])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def get_stats(self) -> dict:
+        return {
+            name: {"weight": self.weights[name], "queued": len(queue), "dispatched": self.dispatched[name]}
+            for name, queue in self._queues.items()
+        }
@@ -0,0 +1,207 @@
+"""
+Simulated Z-Image pipeline for benchmarking the serving layer
+
+Stands in for OVZImagePipeline when PIPELINE_BACKEND=simulated, so the API,
+batching, caching and storage layers can be measured without the model.
+It has the same structure as the OpenVINO pipeline (text encoder,
+transformer and VAE decoder parts with compiled models and infer requests,
+a scheduler, reshape and compile), so stream replicas and static-shape
+buckets work on it unchanged.
+
+Each part sleeps for its configured cost instead of computing. Sleeping
+releases the GIL like an OpenVINO inference call does, so concurrent streams
+overlap the way they would on a real device, but the host CPU is left free:
+numbers measure the serving layer's overhead, not device contention.
+Transformer and decoder costs scale with pixel count and batch size relative
+to one 512x512 image. Output images are smooth noise upscaled from seeded
+latents, so encoding costs are realistic and seeded runs are reproducible.
+"""
+import logging
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union
+
+import torch
+from PIL import Image
+
+from config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENT_CHANNELS = 16
+REFERENCE_PIXELS = 512 * 512
+EMBEDDING_SHAPE = (64, 256)  # Tokens x hidden size of the simulated prompt embeddings
+
+
+def _sleep_ms(milliseconds: float):
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000)
+
+
+class _SimulatedInferRequest:
+    """Infer request that sleeps for the cost of one inference"""
+
+    def __init__(self, cost: Callable[[dict], float]):
+        self._cost = cost
+
+    def infer(self, inputs: Any = None, *args, **kwargs):
+        _sleep_ms(self._cost(inputs or {}))
+        return {}
+
+
+class _SimulatedCompiledModel:
+    """Compiled model whose infer requests sleep for the configured cost"""
+
+    def __init__(self, cost: Callable[[dict], float], config: dict):
+        self._cost = cost
+        self._config = config
+        self._request = _SimulatedInferRequest(cost)
+
+    def create_infer_request(self) -> _SimulatedInferRequest:
+        return _SimulatedInferRequest(self._cost)
+
+    def __call__(self, inputs: Any = None, *args, **kwargs):
+        return self._request.infer(inputs)
+
+    def get_property(self, name: str) -> Any:
+        if name in self._config:
+            return self._config[name]
+        if name == "OPTIMAL_NUMBER_OF_INFER_REQUESTS":
+            return max(1, (os.cpu_count() or 1) // 4)
+        raise RuntimeError(f"Property {name} is not supported by the simulated device")
+
+
+class _SimulatedModel:
+    """Stand-in for ov.Model, holding only the static shape if reshaped"""
+
+    def __init__(self, shape: Optional[tuple] = None):
+        self.shape = shape
+
+    def clone(self) -> "_SimulatedModel":
+        return _SimulatedModel(self.shape)
+
+
+class _SimulatedPart:
+    """One model part (text encoder, transformer or VAE decoder)"""
+
+    def __init__(self, name: str, cost: Callable[[dict], float], ov_config: dict):
+        self.name = name
+        self.cost = cost
+        self.ov_config = dict(ov_config)
+        self.model = _SimulatedModel()
+        self.request: Optional[Any] = None
+
+    def _compile(self):
+        if self.request is None:
+            self.request = _SimulatedCompiledModel(self.cost, self.ov_config)
+
+    def __call__(self, inputs: Optional[dict] = None):
+        self._compile()
+        return self.request(inputs or {})
+
+
+def _scaled_cost(milliseconds: float) -> Callable[[dict], float]:
+    """Cost proportional to pixels times batch size, relative to one 512x512 image"""
+    def cost(inputs: dict) -> float:
+        pixels = inputs.get("height", 512) * inputs.get("width", 512)
+        return milliseconds * inputs.get("batch_size", 1) * pixels / REFERENCE_PIXELS
+    return cost
+
+
+@dataclass
+class SimulatedOutput:
+    """Pipeline output with the generated images"""
+    images: list[Image.Image]
+
+
+class SimulatedPipeline:
+    """Drop-in replacement for OVZImagePipeline that sleeps instead of computing"""
+
+    def __init__(self, ov_config: Optional[dict] = None):
+        ov_config = ov_config or {}
+        self.text_encoder = _SimulatedPart(
+            "text_encoder", lambda inputs: settings.SIMULATED_TEXT_ENCODER_MS * inputs.get("batch_size", 1), ov_config
+        )
+        self.transformer = _SimulatedPart("transformer", _scaled_cost(settings.SIMULATED_STEP_MS), ov_config)
+        self.vae_decoder = _SimulatedPart("vae_decoder", _scaled_cost(settings.SIMULATED_DECODE_MS), ov_config)
+        self.scheduler = {"timesteps": []}
+        self.num_timesteps = 0
+        self._static_shape: Optional[tuple[int, int, int]] = None
+
+    @classmethod
+    def from_pretrained(cls, model_path: str, device: str = "CPU", ov_config: Optional[dict] = None,
+                        compile: bool = True) -> "SimulatedPipeline":
+        logger.info(f"Using simulated pipeline backend instead of {model_path} "
+                    f"({settings.SIMULATED_STEP_MS}ms per step at 512x512)")
+        pipeline = cls(ov_config)
+        if compile:
+            pipeline.compile()
+        return pipeline
+
+    def compile(self):
+        for part in (self.text_encoder, self.transformer, self.vae_decoder):
+            part._compile()
+
+    def reshape(self, batch_size: int, height: int, width: int, num_images_per_prompt: int = 1):
+        self._static_shape = (batch_size * num_images_per_prompt, height, width)
+        for part in (self.transformer, self.vae_decoder):
+            part.model.shape = self._static_shape
+        return self
+
+    def encode_prompt(self, prompt: Union[str, list[str]], do_classifier_free_guidance: bool = False, **kwargs):
+        """Return seeded pseudo-embeddings, one per prompt"""
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        self.text_encoder({"batch_size": len(prompts)})
+        embeds = torch.stack([
+            torch.randn(EMBEDDING_SHAPE, generator=torch.Generator("cpu").manual_seed(zlib.crc32(p.encode("utf-8"))))
+            for p in prompts
+        ])
+        return embeds, None
+
+    def __call__(
+        self,
+        prompt: Union[str, list[str], None] = None,
+        height: int = 512,
+        width: int = 512,
+        num_inference_steps: int = 9,
+        guidance_scale: float = 0.0,
+        generator: Union[torch.Generator, list[torch.Generator], None] = None,
+        prompt_embeds: Optional[Any] = None,
+        negative_prompt_embeds: Optional[Any] = None,
+        callback_on_step_end: Optional[Callable] = None,
+        callback_on_step_end_tensor_inputs: Optional[list[str]] = None,
+        **kwargs
+    ) -> SimulatedOutput:
+        if prompt_embeds is None:
+            prompt_embeds, _ = self.encode_prompt(prompt)
+        batch_size = len(prompt_embeds)
+        if self._static_shape is not None and self._static_shape != (batch_size, height, width):
+            raise ValueError(f"Static pipeline compiled for {self._static_shape}, "
+                             f"called with {(batch_size, height, width)}")
+
+        generators = generator if isinstance(generator, list) else [generator] * batch_size
+        latents = torch.stack([
+            torch.randn((LATENT_CHANNELS, height // 8, width // 8), generator=g) for g in generators
+        ])
+
+        # Classifier-free guidance runs the transformer on a doubled batch
+        step_inputs = {
+            "batch_size": batch_size * (2 if guidance_scale > 1.0 else 1),
+            "height": height,
+            "width": width,
+        }
+        self.num_timesteps = num_inference_steps
+        for step in range(num_inference_steps):
+            self.transformer(step_inputs)
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, step, num_inference_steps - step, {"latents": latents})
+
+        self.vae_decoder({"batch_size": batch_size, "height": height, "width": width})
+        images = []
+        for latent in latents:
+            rgb = ((latent[:3].clamp(-2, 2) + 2) * 63.75).to(torch.uint8).permute(1, 2, 0).numpy()
+            images.append(Image.fromarray(rgb).resize((width, height), Image.BICUBIC))
+        return SimulatedOutput(images=images)
@@ -0,0 +1,164 @@
+"""
+Stored image index for Z-Image-Turbo
+
+Keeps an oldest-first index of the images in the output directory so that
+eviction candidates are found without listing or stat-ing the directory.
+Eviction runs on a background thread, off the request path.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+from imaging import IMAGE_EXTENSIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Index of stored images with count, size and age limits"""
+
+    def __init__(
+        self,
+        directory: Path,
+        max_images: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[float] = None
+    ):
+        self.directory = directory
+        self.max_images = max_images if max_images is not None else settings.MAX_STORED_IMAGES
+        self.max_bytes = max_bytes if max_bytes is not None else settings.MAX_STORED_MB * 1024 * 1024
+        self.max_age_seconds = (max_age_seconds if max_age_seconds is not None
+                                else settings.MAX_IMAGE_AGE_HOURS * 3600)
+
+        # filename -> (size in bytes, creation time), oldest first
+        self._index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._evicted = 0
+
+        self._rebuild()
+
+        self._thread = threading.Thread(target=self._eviction_loop, name="image-store-evictor", daemon=True)
+        self._thread.start()
+
+    def _rebuild(self):
+        """Scan the output directory once and index existing images by age"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        with self._lock:
+            self._index.clear()
+            self._bytes = 0
+            for mtime, name, size in sorted(entries):
+                self._index[name] = (size, mtime)
+                self._bytes += size
+
+        logger.info(f"Indexed {len(entries)} stored images ({self._bytes / 1024 / 1024:.1f} MB)")
+        self._wakeup.set()
+
+    def add(self, filename: str, size: int):
+        """Record a newly saved image"""
+        with self._lock:
+            old = self._index.pop(filename, None)
+            if old is not None:
+                self._bytes -= old[0]
+            self._index[filename] = (size, time.time())
+            self._bytes += size
+            over_limit = self._over_limit()
+
+        if over_limit:
+            self._wakeup.set()
+
+    def remove(self, filename: str):
+        """Delete an image and drop it from the index"""
+        with self._lock:
+            entry = self._index.pop(filename, None)
+            if entry is not None:
+                self._bytes -= entry[0]
+        self._unlink(filename)
+
+    def __contains__(self, filename: str) -> bool:
+        with self._lock:
+            return filename in self._index
+
+    def _over_limit(self) -> bool:
+        if self.max_images > 0 and len(self._index) > self.max_images:
+            return True
+        if self.max_bytes > 0 and self._bytes > self.max_bytes:
+            return True
+        if self.max_age_seconds > 0 and self._index:
+            _, created = next(iter(self._index.values()))
+            if time.time() - created > self.max_age_seconds:
+                return True
+        return False
+
+    def _evict(self) -> list[str]:
+        """Pop the oldest entries until every limit is met"""
+        evicted = []
+        with self._lock:
+            while self._index and self._over_limit():
+                filename, (size, _) = self._index.popitem(last=False)
+                self._bytes -= size
+                evicted.append(filename)
+            self._evicted += len(evicted)
+        return evicted
+
+    def _next_expiry(self) -> Optional[float]:
+        """Seconds until the oldest image exceeds the age limit"""
+        if self.max_age_seconds <= 0:
+            return None
+        with self._lock:
+            if not self._index:
+                return self.max_age_seconds
+            _, created = next(iter(self._index.values()))
+        return max(0.0, created + self.max_age_seconds - time.time())
+
+    def _eviction_loop(self):
+        while True:
+            self._wakeup.wait(timeout=self._next_expiry())
+            self._wakeup.clear()
+            for filename in self._evict():
+                self._unlink(filename)
+                logger.info(f"Deleted old image: {filename}")
+
+    def _unlink(self, filename: str):
+        try:
+            (self.directory / filename).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to delete image {filename}: {e}")
+
+    def get_stats(self) -> dict:
+        """Get stored image count, size and limits"""
+        with self._lock:
+            return {
+                "images": len(self._index),
+                "bytes": self._bytes,
+                "max_images": self.max_images,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "evicted": self._evicted,
+            }
+
+
+# Global image store instance
+_image_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """Get or create global image store instance"""
+    global _image_store
+    if _image_store is None:
+        _image_store = ImageStore(settings.get_output_dir())
+    return _image_store
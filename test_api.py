@@ -2,6 +2,7 @@
 Test script for Z-Image-Turbo API
 """
 import argparse
+import json
 import time
 from pathlib import Path
 
@@ -120,6 +121,51 @@ def test_generate_url(base_url: str, prompt: str):
         return False
 
 
+def test_generate_batch(base_url: str, prompt: str):
+    """Test batch endpoint: invalid items fail on their own lines, valid ones still generate"""
+    print("\n" + "=" * 60)
+    print("Testing Generate Batch Endpoint")
+    print("=" * 60)
+
+    url = f"{base_url}/generate/batch"
+    print(f"POST {url}")
+
+    items = [
+        {"prompt": prompt, "height": 512, "width": 512, "num_inference_steps": 9, "seed": 1},
+        {"prompt": prompt, "height": 128},  # Below the minimum height
+        {"prompt": prompt, "num_inference_steps": 51},  # Above the maximum steps
+        {"prompt": prompt, "format": "gif"},  # Unknown format
+        {"prompt": prompt, "height": 512, "width": 512, "num_inference_steps": 9, "seed": 2},
+    ]
+    expected = {0: 200, 1: 422, 2: 422, 3: 422, 4: 200}
+
+    try:
+        print("\nGenerating images (this may take a while)...")
+        response = requests.post(url, json={"items": items}, stream=True)
+        response.raise_for_status()
+
+        statuses = {}
+        summary = None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if "summary" in result:
+                summary = result["summary"]
+                continue
+            statuses[result["index"]] = 200 if result["success"] else result["status"]
+            print(f"Item {result['index']}: {'OK' if result['success'] else result['status']}")
+
+        print(f"Summary: {summary}")
+        if statuses != expected:
+            print(f"Expected per-item statuses {expected}, got {statuses}")
+            return False
+        return summary is not None and summary["succeeded"] == 2 and summary["failed"] == 3
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+
 def main():
     parser = argparse.ArgumentParser(description="Test Z-Image-Turbo API")
     parser.add_argument(
@@ -143,7 +189,7 @@ def main():
     parser.add_argument(
         "--test",
         type=str,
-        choices=["health", "file", "url", "all"],
+        choices=["health", "file", "url", "batch", "all"],
         default="all",
         help="Which test to run (default: all)"
     )
@@ -167,6 +213,9 @@ def main():
     if args.test in ["url", "all"]:
         results["url"] = test_generate_url(args.url, args.prompt)
 
+    if args.test in ["batch", "all"]:
+        results["batch"] = test_generate_batch(args.url, args.prompt)
+
     # Summary
     print("\n" + "=" * 60)
     print("Test Summary")
@@ -0,0 +1,9 @@
+"""
+Unit tests for Z-Image-Turbo that run without a server or a model
+
+The server modules live at the project root; make them importable.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
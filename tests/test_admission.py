@@ -0,0 +1,114 @@
+"""Tests for the cost model, cost-aware admission control and deadlines"""
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionController, AdmissionRejected, CostModel, work_units
+from api import _deadline, _deadline_missed, _over_budget
+from scheduler import DeadlineExceededError
+
+
+def make_controller(budget: float = 0) -> AdmissionController:
+    return AdmissionController(CostModel(prior_step_seconds=1.0), latency_budget=budget)
+
+
+def test_work_units_scale_with_pixels_steps_and_guidance():
+    assert work_units(512, 512, 1) == 1
+    assert work_units(1024, 1024, 9) == 36
+    assert work_units(512, 512, 10, images=2, guidance_scale=3.0) == 40
+
+
+def test_cost_model_uses_prior_until_measured():
+    model = CostModel(prior_step_seconds=0.5)
+    assert model.estimate("int4", 10) == pytest.approx(5.0)
+
+
+def test_cost_model_fits_overhead_and_rate():
+    model = CostModel(prior_step_seconds=1.0)
+    for units in (1, 2, 4, 8):
+        model.observe("int4", units, 0.5 + 0.2 * units)
+    assert model.estimate("int4", 20) == pytest.approx(4.5)
+    # Other variants keep their own fit
+    assert model.estimate("fp16", 20) == pytest.approx(20.0)
+
+
+def test_completion_divides_only_the_backlog_by_parallelism():
+    controller = make_controller()
+    with controller.admit("int4", 4):
+        ticket = controller.admit("int4", 4, parallelism=2)
+        # 4s of backlog drains on two streams, then this request runs for 4s on one
+        assert ticket.estimated_completion == pytest.approx(6.0)
+        ticket.release()
+
+
+def test_request_over_budget_is_rejected_with_retry_after():
+    controller = make_controller(budget=10)
+    with controller.admit("int4", 8):
+        with pytest.raises(AdmissionRejected) as excinfo:
+            controller.admit("int4", 8)
+        assert excinfo.value.estimated_seconds == pytest.approx(16.0)
+        assert excinfo.value.retry_after == 6
+        # Work accepted elsewhere is counted but never rejected
+        controller.admit("int4", 8, enforce=False).release()
+    assert controller.get_stats()["rejected"] == 1
+
+
+def test_idle_server_admits_a_request_larger_than_the_budget():
+    controller = make_controller(budget=10)
+    with controller.admit("int4", 100) as ticket:
+        assert ticket.estimated_completion == pytest.approx(100.0)
+
+
+def test_closing_a_ticket_releases_its_backlog():
+    controller = make_controller(budget=10)
+    ticket = controller.admit("int4", 8)
+    assert controller.backlog_seconds == pytest.approx(8.0)
+    ticket.release()
+    ticket.release()  # Releasing twice is harmless
+    assert controller.backlog_seconds == 0
+    assert controller.get_stats()["in_flight"] == 0
+    with controller.admit("int4", 8):
+        controller.admit("int4", 2).release()
+
+
+def test_over_budget_response_is_503_with_retry_after():
+    error = _over_budget(AdmissionRejected(retry_after=6, estimated_seconds=16.0))
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "6"
+    assert error.headers["X-Estimated-Completion"] == "16.0"
+
+
+def test_request_that_cannot_meet_its_deadline_is_rejected():
+    controller = make_controller()
+    with controller.admit("int4", 8):
+        with pytest.raises(DeadlineExceededError) as excinfo:
+            controller.admit("int4", 4, deadline=time.monotonic() + 5)
+        assert excinfo.value.estimated_seconds == pytest.approx(12.0)
+        controller.admit("int4", 4, deadline=time.monotonic() + 60).release()
+    assert controller.get_stats()["rejected"] == 1
+
+
+def test_deadline_in_the_past_is_rejected_at_admission():
+    controller = make_controller()
+    with pytest.raises(DeadlineExceededError):
+        controller.admit("int4", 1, deadline=time.monotonic() - 1)
+
+
+def test_x_deadline_header_parsing():
+    def request(value: str) -> SimpleNamespace:
+        return SimpleNamespace(headers={"x-deadline": value})
+
+    now = time.monotonic()
+    assert _deadline(SimpleNamespace(headers={})) is None
+    assert _deadline(request("30")) == pytest.approx(now + 30, abs=1)
+    assert _deadline(request(str(time.time() + 30))) == pytest.approx(now + 30, abs=1)
+    for value, status in (("soon", 400), ("-1", 504), (str(time.time() - 10), 504)):
+        with pytest.raises(HTTPException) as excinfo:
+            _deadline(request(value))
+        assert excinfo.value.status_code == status
+
+
+def test_missed_deadline_response_is_504():
+    assert _deadline_missed(DeadlineExceededError(12.0)).status_code == 504
@@ -0,0 +1,28 @@
+"""Tests for bringing pipeline outputs to the requested size"""
+from PIL import Image, ImageDraw
+
+from imaging import fit_to_size
+
+
+def centre_square(image: Image.Image) -> tuple[int, int]:
+    """Width and height of the dark shape in an image"""
+    left, top, right, bottom = image.convert("L").point(lambda v: 255 if v < 128 else 0).getbbox()
+    return right - left, bottom - top
+
+
+def test_degraded_render_is_not_stretched():
+    # A 600x400 render (a smaller degraded bucket) for a 700x350 request (padded in height)
+    render = Image.new("RGB", (600, 400), "white")
+    ImageDraw.Draw(render).rectangle((250, 150, 349, 249), fill="black")  # 100x100 square at the centre
+    image = fit_to_size(render, 700, 350)
+    assert image.size == (700, 350)
+    width, height = centre_square(image)
+    assert abs(width - height) <= 2
+
+
+def test_padded_render_is_cropped_without_scaling():
+    render = Image.new("RGB", (768, 768), "white")
+    ImageDraw.Draw(render).rectangle((334, 334, 433, 433), fill="black")
+    image = fit_to_size(render, 700, 350)
+    assert image.size == (700, 350)
+    assert centre_square(image) == (100, 100)
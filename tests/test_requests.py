@@ -0,0 +1,15 @@
+"""Tests for request validation in the API models"""
+import pytest
+from pydantic import ValidationError
+
+from api import GenerationRequest
+
+
+def test_seed_and_seeds_together_are_rejected():
+    with pytest.raises(ValidationError, match="either seed or seeds"):
+        GenerationRequest(prompt="a cat", seed=1, seeds=[1, 2])
+
+
+def test_seed_or_seeds_alone_are_accepted():
+    assert GenerationRequest(prompt="a cat", seed=1).seed == 1
+    assert GenerationRequest(prompt="a cat", seeds=[1, 2]).multiple
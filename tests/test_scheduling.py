@@ -0,0 +1,108 @@
+"""Tests for the fair queue, API key limits and deadlines"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import api_keys
+from api import _acquire
+from api_keys import Client, ClientPolicy, RateLimitedError, TokenBucket
+from scheduler import FairQueue
+
+
+def make_task(name: str, priority: str = "default", cost: float = 1.0, enqueued_at: float = 0.0,
+              deadline=None) -> SimpleNamespace:
+    return SimpleNamespace(name=name, priority=priority, cost=cost, enqueued_at=enqueued_at,
+                           deadline=deadline, expires=deadline, virtual_arrival=0.0, finish_tag=0.0)
+
+
+def drain(queue: FairQueue) -> list[str]:
+    return [queue.pop().name for _ in range(len(queue))]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test advances by hand"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(api_keys.time, "monotonic", lambda: now.value)
+    return now
+
+
+def test_fair_queue_serves_classes_in_proportion_to_weight():
+    queue = FairQueue({"interactive": 3.0, "bulk": 1.0}, "interactive", policy="fifo")
+    for i in range(8):
+        queue.push(make_task(f"i{i}", "interactive"))
+        queue.push(make_task(f"b{i}", "bulk"))
+
+    order = drain(queue)
+    assert order[:8] == ["i0", "i1", "i2", "b0", "i3", "i4", "i5", "b1"]
+    assert queue.get_stats()["interactive"]["dispatched"] == 8
+
+
+def test_fair_queue_charges_by_cost():
+    queue = FairQueue({"interactive": 1.0, "bulk": 1.0}, "interactive", policy="fifo")
+    queue.push(make_task("big", "bulk", cost=4.0))
+    queue.push(make_task("bulk-next", "bulk", cost=1.0))
+    for i in range(4):
+        queue.push(make_task(f"small{i}", "interactive", cost=1.0))
+    # One 4s job costs the bulk class as much as four 1s jobs
+    assert drain(queue) == ["small0", "small1", "small2", "small3", "big", "bulk-next"]
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=4.0)
+    assert bucket.take(4) == 0
+    assert bucket.take(1) == pytest.approx(0.5)
+    clock.value += 0.5
+    assert bucket.take(1) == 0
+    clock.value += 10
+    # Never refills past the burst size
+    assert bucket.take(4) == 0
+    assert bucket.take(1) > 0
+
+
+def test_rate_limited_client_is_told_when_to_retry(clock):
+    client = Client(ClientPolicy(name="etl", rate=1.0, burst=2.0))
+    client.acquire(2).release()
+    with pytest.raises(RateLimitedError) as excinfo:
+        client.acquire(1)
+    assert excinfo.value.reason == "rate"
+    assert excinfo.value.retry_after == 1
+
+
+def test_concurrency_limit_counts_images_in_flight():
+    client = Client(ClientPolicy(name="web", max_concurrency=2))
+    first = client.acquire(1)
+    with client.acquire(1):
+        with pytest.raises(RateLimitedError, match="concurrency"):
+            client.acquire(1)
+    # A released slot makes room again
+    client.acquire(1).release()
+    first.release()
+    assert client.in_flight == 0
+
+
+def test_concurrency_limit_lets_one_oversized_request_through_when_idle():
+    client = Client(ClientPolicy(name="web", max_concurrency=2))
+    with client.acquire(4):
+        with pytest.raises(RateLimitedError):
+            client.acquire(1)
+
+
+def test_over_limit_response_is_429_with_retry_after():
+    client = Client(ClientPolicy(name="web", max_concurrency=1))
+    with client.acquire(1):
+        with pytest.raises(HTTPException) as excinfo:
+            _acquire(client)
+    assert excinfo.value.status_code == 429
+    assert "Retry-After" in excinfo.value.headers
+
+
+def test_edf_serves_earliest_deadline_first():
+    queue = FairQueue({"default": 1.0}, "default", policy="edf", default_deadline=300)
+    queue.push(make_task("late", enqueued_at=0.0, deadline=50.0))
+    queue.push(make_task("no-deadline", enqueued_at=0.0))  # Due at 0 + 300
+    queue.push(make_task("soon", enqueued_at=5.0, deadline=10.0))
+    queue.push(make_task("old-no-deadline", enqueued_at=-290.0))  # Due at 10, after "soon" by arrival
+    assert drain(queue) == ["soon", "old-no-deadline", "late", "no-deadline"]
+
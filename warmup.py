@@ -0,0 +1,109 @@
+"""
+Startup warm-up for Z-Image-Turbo
+
+The first pipeline run at a given shape pays for shape specialization,
+memory arena growth and kernel selection. Warm-up runs a dummy generation
+at each configured shape on every stream before the server reports ready,
+so real requests never see those costs.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from config import settings
+from executor import get_executor
+from generator import get_generator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WARMUP_PROMPT = "warm-up"
+
+
+def parse_shapes(value: str) -> list[tuple[int, int, int]]:
+    """
+    Parse WARMUP_SHAPES, a comma-separated list of HEIGHTxWIDTH[xSTEPS]
+
+    An empty value warms up the default resolution and step count.
+    """
+    shapes = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        parts = [int(part) for part in item.split("x")]
+        if len(parts) == 2:
+            parts.append(settings.DEFAULT_STEPS)
+        if len(parts) != 3:
+            raise ValueError(f"Invalid warm-up shape '{item}', expected HEIGHTxWIDTH[xSTEPS]")
+        shapes.append((parts[0], parts[1], parts[2]))
+    return shapes or [(settings.DEFAULT_HEIGHT, settings.DEFAULT_WIDTH, settings.DEFAULT_STEPS)]
+
+
+class Warmup:
+    """Runs the warm-up pass and tracks whether the server is ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timings: list[dict] = []
+        self.errors: list[str] = []
+
+    async def run(self):
+        """Warm up every configured shape on every stream, then mark the server ready"""
+        if not settings.WARMUP_ENABLED:
+            self.ready = True
+            return
+
+        generator = get_generator()
+        executor = get_executor()
+        self.started_at = time.time()
+        shapes = parse_shapes(settings.WARMUP_SHAPES)
+        logger.info(f"Warming up {len(shapes)} shape(s) on {generator.streams} stream(s)...")
+
+        for height, width, steps in shapes:
+            start = time.perf_counter()
+            try:
+                job = generator.resolve_job(WARMUP_PROMPT, height, width, steps, seed=0)
+                # One run per stream; concurrent runs each take a different replica
+                await asyncio.gather(*[
+                    executor.submit(generator.generate_batch, [job], observe_cost=False)
+                    for _ in range(generator.streams)
+                ])
+            except Exception as e:
+                logger.warning(f"Warm-up at {height}x{width}, {steps} steps failed: {e}")
+                self.errors.append(f"{height}x{width}x{steps}: {e}")
+                continue
+
+            seconds = time.perf_counter() - start
+            self.timings.append({"height": height, "width": width, "steps": steps, "seconds": round(seconds, 3)})
+            logger.info(f"Warmed up {height}x{width}, {steps} steps in {seconds:.1f}s")
+
+        self.finished_at = time.time()
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s, server ready")
+
+    def get_status(self) -> dict:
+        """Get readiness and warm-up timings"""
+        return {
+            "ready": self.ready,
+            "enabled": settings.WARMUP_ENABLED,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": self.timings,
+            "errors": self.errors,
+        }
+
+
+# Global warm-up instance
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    """Get or create global warm-up instance"""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup